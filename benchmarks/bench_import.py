@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Import time of the timeline core compared to pandas, each measured in a fresh interpreter.
+
+Usage: python -m benchmarks.bench_import [--runs 10]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+MODULES = ["numpy", "src.timeline", "pandas", "src.shiftcalendar"]
+
+
+def import_time(module: str) -> float:
+    """Returns the time to import module in a new interpreter, in seconds."""
+    code = (f"import time; start = time.perf_counter(); import {module}; "
+            "print(time.perf_counter() - start)")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True)
+    return float(output.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    print(f"{'module':>18} {'median [ms]':>12} {'min [ms]':>10}")
+    for module in MODULES:
+        times = [import_time(module) for _ in range(args.runs)]
+        print(f"{module:>18} {1000 * statistics.median(times):>12.1f} {1000 * min(times):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
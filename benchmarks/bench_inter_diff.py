@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of TimeLine.inter_diff against the former pairwise implementation.
+
+Usage: python -m benchmarks.bench_inter_diff [--sizes 1000 10000 100000] [--legacy-max 1000]
+
+The pairwise implementation is O(n*m) in TimeRange operations, so by
+default it is only timed up to 10^3 ranges.
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from src.timeline import TimeLine
+
+
+def random_calendar(n: int, seed: int) -> TimeLine:
+    """Returns a merged timeline of n ranges with random lengths and gaps."""
+    rng = np.random.RandomState(seed)
+    minute = pd.Timedelta(value=1, unit="minutes").value
+    lengths = rng.randint(30, 8 * 60, size=n) * minute
+    gaps = rng.randint(1, 4 * 60, size=n) * minute
+    starts = pd.Timestamp("2021-01-01").value + np.cumsum(gaps + lengths) - lengths
+    return TimeLine._from_ns(starts, starts + lengths, merged=True)
+
+
+def legacy_inter_diff(src: TimeLine, other: TimeLine):
+    """Pairwise inter_diff as implemented on lists of TimeRange objects."""
+    src_trs, other_trs = src.timeranges, other.timeranges
+    inter = []
+    diff = []
+    for src_tr in src_trs:
+        for subt_tr in other_trs:
+            if src_tr.is_intersection(subt_tr):
+                inter.append(src_tr.intersection(subt_tr))
+        diff.extend(src_tr.differences(other_trs))
+    return inter, diff
+
+
+def timeit(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--legacy-max", type=int, default=1000)
+    args = parser.parse_args()
+    print(f"{'ranges':>8} {'sweep [s]':>12} {'pairwise [s]':>14} {'speedup':>9}")
+    for n in args.sizes:
+        shifts, maintenance = random_calendar(n, seed=0), random_calendar(n, seed=1)
+        sweep = timeit(shifts.inter_diff, maintenance)
+        if n <= args.legacy_max:
+            pairwise = timeit(legacy_inter_diff, shifts, maintenance)
+            print(f"{n:>8} {sweep:>12.4f} {pairwise:>14.4f} {pairwise / sweep:>8.0f}x")
+        else:
+            print(f"{n:>8} {sweep:>12.4f} {'skipped':>14} {'':>9}")
+
+
+if __name__ == "__main__":
+    main()
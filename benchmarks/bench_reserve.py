@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Throughput of TimeLine.reserve/release with many threads on one timeline.
+
+Usage: python -m benchmarks.bench_reserve [--threads 1 2 4 8] [--reservations 20000]
+
+Each thread reserves random durations and releases every second
+reservation again. Afterwards the reservations are checked for overlaps.
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from src.timeline import TimeLine
+from benchmarks.bench_inter_diff import random_calendar
+
+
+def dispatcher(timeline: TimeLine, n: int, seed: int):
+    """Reserves n slots, releasing every second one."""
+    rng = np.random.RandomState(seed)
+    kept = []
+    for k, minutes in enumerate(rng.randint(5, 120, size=n)):
+        reservation = timeline.reserve(pd.Timedelta(value=int(minutes), unit="minutes"))
+        if k % 2:
+            timeline.release(reservation)
+        else:
+            kept.append(reservation)
+    return kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--reservations", type=int, default=20000)
+    args = parser.parse_args()
+    print(f"{'threads':>8} {'time [s]':>10} {'ops/s':>10} {'overlaps':>9}")
+    for threads in args.threads:
+        timeline = random_calendar(args.reservations, seed=0)
+        per_thread = args.reservations // threads
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            kept = executor.map(dispatcher, [timeline] * threads, [per_thread] * threads,
+                                range(threads))
+            kept = [reservation for reservations in kept for reservation in reservations]
+        duration = time.perf_counter() - start
+        reserved = pd.Timedelta(value=sum(r.timedelta.value for r in kept))
+        overlaps = reserved != TimeLine(kept).timedelta
+        ops = 2 * threads * per_thread - len(kept)
+        print(f"{threads:>8} {duration:>10.3f} {ops / duration:>10.0f} {str(overlaps):>9}")
+
+
+if __name__ == "__main__":
+    main()
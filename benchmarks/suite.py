@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite timing the TimeLine/TimeRange operations on synthetic calendars.
+
+Usage:
+    python -m benchmarks.suite run [--sizes 100 1000 ...] [--patterns sparse ...] [--output results.json]
+    python -m benchmarks.suite compare base.json new.json [--threshold 1.25]
+
+For each calendar pattern and operation, run times the operation for
+every size and fits the empirical complexity exponent k of t ~ n^k.
+compare flags operations which got slower than threshold times the base
+run at some size, or whose exponent grew by more than exponent-tolerance,
+and exits with status 1 if there are any.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.timerange import TimeRange
+from src.timeline import TimeLine
+from test.custom_strategies import CustomStrategies as cs
+
+MINUTE = pd.Timedelta(value=1, unit="minutes").value
+SECOND = pd.Timedelta(value=1, unit="seconds").value
+PATTERNS = ["sparse", "fragmented", "overlapping"]
+# calendars start early enough to fit 10^6 ranges of each pattern into datetime64[ns]
+ORIGIN = pd.Timestamp("1700-01-01").value
+# longest time a range and the gap before it can take in each pattern, see calendar_arrays
+MAX_SPACING = {"sparse": 4 * 60 * MINUTE, "fragmented": 7 * MINUTE,
+               "overlapping": 2 * 60 * MINUTE}
+# format of the timestamp strings parsed by from_strings, which is timed up to STRING_MAX_SIZE
+STRING_FORMAT = "%Y-%m-%dT%H:%M:%S"
+STRING_MAX_SIZE = 10**6
+# largest size for which the TimeRange objects of both timelines are created
+TIMERANGE_MAX_SIZE = 10**5
+
+
+def max_calendar_size(pattern: str) -> int:
+    """Largest number of ranges of a pattern which always fit into datetime64[ns],
+    e.g about 1.2*10^6 sparse and 4*10^7 fragmented ranges."""
+    if pattern not in MAX_SPACING:
+        raise ValueError(f"unknown pattern {pattern}, expected one of {PATTERNS}.")
+    return (pd.Timestamp.max.value - ORIGIN) // MAX_SPACING[pattern] - 1
+
+
+def calendar_arrays(pattern: str, n: int, seed: int) -> Tuple[np.ndarray]:
+    """Returns start/end arrays in nanoseconds of n ranges of a pattern, starting at ORIGIN.
+
+    sparse: shifts of 30 min to 3 h with gaps of 1 min to 1 h, already merged
+    fragmented: ranges of 1 to 5 min with gaps of 1 to 2 min, already merged
+    overlapping: unordered ranges of 1 s to 2 h, spread over a span growing
+        with n, so that about half of them overlap
+
+    Raises
+    ------
+    ValueError
+        raised when n is larger than max_calendar_size(pattern).
+    """
+    if n > max_calendar_size(pattern):
+        raise ValueError(f"{n} {pattern} ranges do not fit into datetime64[ns], "
+                         f"at most {max_calendar_size(pattern)} do.")
+    rng = np.random.RandomState(seed)
+    if pattern == "overlapping":
+        min_length, max_length = cs.VMIN_TIMEDELTA.value, MAX_SPACING[pattern]
+        span = n * (max_length - min_length)
+        starts = ORIGIN + rng.randint(0, span // SECOND, size=n) * SECOND
+        return starts, starts + rng.randint(min_length // SECOND, max_length // SECOND, size=n) * SECOND
+    if pattern == "sparse":
+        lengths, gaps = rng.randint(30, 3 * 60, size=n), rng.randint(1, 60, size=n)
+    else:
+        lengths, gaps = rng.randint(1, 6, size=n), rng.randint(1, 3, size=n)
+    lengths, gaps = lengths * MINUTE, gaps * MINUTE
+    starts = ORIGIN + np.cumsum(gaps + lengths) - lengths
+    return starts, starts + lengths
+
+
+class Case(NamedTuple):
+    """Inputs of the operations for one pattern and size."""
+    raw_starts: np.ndarray
+    raw_ends: np.ndarray
+    # raw starts and ends as lists of strings, None above STRING_MAX_SIZE
+    start_strings: Optional[List[str]]
+    end_strings: Optional[List[str]]
+    timeline: TimeLine
+    other: TimeLine
+    middle: pd.Timestamp
+    quarter: pd.Timedelta
+    timerange: TimeRange
+    # 101 datetime64[ns] timestamps evenly spread from the start to the end of the timeline
+    samples: np.ndarray
+    # timeranges of both timelines, None above TIMERANGE_MAX_SIZE
+    timeranges: Optional[List[TimeRange]]
+    other_timeranges: Optional[List[TimeRange]]
+    # file the timeline is saved to
+    path: str
+
+    def fresh(self) -> TimeLine:
+        """Timeline sharing the arrays but none of the cached aggregates."""
+        return TimeLine._from_ns(self.timeline._starts, self.timeline._ends, merged=True)
+
+
+def make_case(pattern: str, n: int, directory: str) -> Case:
+    starts, ends = calendar_arrays(pattern, n, seed=0)
+    start_strings = end_strings = None
+    if n <= STRING_MAX_SIZE:
+        start_strings = np.datetime_as_string(starts.view("datetime64[ns]"), unit="s").tolist()
+        end_strings = np.datetime_as_string(ends.view("datetime64[ns]"), unit="s").tolist()
+    timeline = TimeLine._from_ns(starts, ends)
+    other = TimeLine._from_ns(*calendar_arrays(pattern, n, seed=1))
+    total = int(timeline._prefix_sums[-1])
+    middle = timeline._datetime_at_ns(total // 2)
+    timerange = TimeRange._from_ns(middle, middle + 90 * MINUTE, timeline.ts_format)
+    samples = np.linspace(timeline._starts[0], timeline._ends[-1], 101).astype(np.int64)
+    timeranges = other_timeranges = None
+    if n <= TIMERANGE_MAX_SIZE:
+        timeranges, other_timeranges = timeline.timeranges, other.timeranges
+    path = os.path.join(directory, f"{pattern}_{n}.timeline")
+    timeline.save(path)
+    return Case(starts, ends, start_strings, end_strings, timeline, other, pd.Timestamp(middle),
+                pd.Timedelta(value=total // 4), timerange, samples.view("datetime64[ns]"),
+                timeranges, other_timeranges, path)
+
+
+def reserve_release(case: Case) -> None:
+    timeline = case.timeline.branch()
+    timeline.release(timeline.reserve(pd.Timedelta(minutes=1), case.middle))
+
+
+def rolling_availability(case: Case) -> Tuple[np.ndarray]:
+    """About 1000 windows, each a tenth of the timeline long."""
+    span = int(case.samples[-1].view(np.int64) - case.samples[0].view(np.int64))
+    return case.timeline.rolling_availability(pd.Timedelta(value=span // 10),
+                                              pd.Timedelta(value=max(span // 1000, 1)))
+
+
+def save(case: Case) -> None:
+    case.timeline.save(case.path + ".tmp")
+
+
+# operation -> (function of a case, largest size it is timed for)
+OPERATIONS: Dict[str, Tuple[Callable[[Case], object], int]] = {
+    "from_arrays": (lambda c: TimeLine.from_arrays(c.raw_starts.view("datetime64[ns]"),
+                                                   c.raw_ends.view("datetime64[ns]")), 10**7),
+    "from_strings": (lambda c: TimeLine.from_arrays(c.start_strings, c.end_strings,
+                                                    STRING_FORMAT), STRING_MAX_SIZE),
+    "merge": (lambda c: TimeLine._from_ns(c.raw_starts, c.raw_ends), 10**7),
+    "timedelta": (lambda c: c.fresh().timedelta, 10**7),
+    "inter_diff": (lambda c: c.timeline.inter_diff(c.other), 10**7),
+    "union_all": (lambda c: TimeLine.union_all([c.timeline, c.other]), 10**7),
+    "coverage": (lambda c: TimeLine.coverage([c.timeline, c.other], min_count=2), 10**7),
+    "split": (lambda c: c.timeline.split(c.middle), 10**7),
+    "consume": (lambda c: c.fresh().consume(c.quarter), 10**7),
+    "consume_many": (lambda c: c.fresh().consume_many([c.quarter / 100] * 100), 10**7),
+    "position_of": (lambda c: c.fresh().position_of(c.middle), 10**7),
+    "find_slot": (lambda c: c.fresh().find_slot(pd.Timedelta(hours=4), c.middle), 10**7),
+    "cumulative_at": (lambda c: c.timeline.cumulative_at(c.samples), 10**7),
+    "availability_per_bin": (lambda c: c.timeline.availability_per_bin(c.samples), 10**7),
+    "rolling_availability": (rolling_availability, 10**7),
+    "split_at": (lambda c: c.timeline.split_at(c.samples), 10**7),
+    "insert": (lambda c: c.timeline.branch().insert(c.timerange), 10**7),
+    "remove": (lambda c: c.timeline.branch().remove(c.timerange), 10**7),
+    "reserve_release": (reserve_release, 10**7),
+    "copy": (lambda c: c.timeline.copy(), 10**7),
+    "add": (lambda c: c.timeline + c.other, 10**7),
+    "has_overlaps": (lambda c: c.timeline.has_overlaps, 10**7),
+    "save": (save, 10**7),
+    "load": (lambda c: TimeLine.load(c.path, mmap=False), 10**7),
+    "load_mmap": (lambda c: TimeLine.load(c.path), 10**7),
+    "iterate": (lambda c: c.timeline.timeranges, TIMERANGE_MAX_SIZE),
+    "timerange_merge": (lambda c: TimeRange.merge(c.timeline.timeranges), TIMERANGE_MAX_SIZE),
+    "timerange_intersection": (lambda c: [x.intersection(y) for x, y in zip(
+        c.timeranges, c.other_timeranges)], TIMERANGE_MAX_SIZE),
+    "timerange_subtract": (lambda c: [x.subtract(y) for x, y in zip(
+        c.timeranges, c.other_timeranges)], TIMERANGE_MAX_SIZE),
+}
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """Returns the best time of func in seconds over repeat runs of about 0.2 s each."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def fit_exponent(sizes: List[int], seconds: List[float], fit_min: int) -> Optional[float]:
+    """Fits t ~ n^k in log-log space, using only sizes from fit_min on if possible,
+    since constant overheads dominate the smallest sizes."""
+    sizes, seconds = np.asarray(sizes, dtype=float), np.asarray(seconds, dtype=float)
+    if np.count_nonzero(sizes >= fit_min) >= 2:
+        sizes, seconds = sizes[sizes >= fit_min], seconds[sizes >= fit_min]
+    if len(sizes) < 2:
+        return None
+    return float(np.polyfit(np.log(sizes), np.log(seconds), 1)[0])
+
+
+def run(sizes: List[int], patterns: List[str], operations: List[str], repeat: int,
+        fit_min: int) -> dict:
+    """Times the operations for each pattern and size.
+
+    Raises
+    ------
+    ValueError
+        raised before timing anything when a size exceeds max_calendar_size of a pattern.
+    """
+    too_large = [f"{n} {pattern}" for pattern in patterns for n in sizes
+                 if n > max_calendar_size(pattern)]
+    if too_large:
+        raise ValueError(f"calendars of {', '.join(too_large)} ranges do not fit into datetime64[ns].")
+    results = {}
+    for pattern in patterns:
+        results[pattern] = {name: {"sizes": [], "seconds": []} for name in operations}
+        for n in sizes:
+            with tempfile.TemporaryDirectory() as directory:
+                case = make_case(pattern, n, directory)
+                time_case(pattern, n, case, operations, repeat, results[pattern])
+        for result in results[pattern].values():
+            result["exponent"] = fit_exponent(result["sizes"], result["seconds"], fit_min)
+    return {
+        "meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                 "python": platform.python_version(), "numpy": np.__version__,
+                 "pandas": pd.__version__, "machine": platform.platform()},
+        "results": results,
+    }
+
+
+def time_case(pattern: str, n: int, case: Case, operations: List[str], repeat: int,
+              results: dict) -> None:
+    """Times the operations on one case and appends the times to results."""
+    for name in operations:
+        func, max_size = OPERATIONS[name]
+        if n > max_size:
+            continue
+        seconds = measure(lambda: func(case), repeat)
+        results[name]["sizes"].append(n)
+        results[name]["seconds"].append(seconds)
+        print(f"{pattern:>12} {name:>22} {n:>9} {seconds:>12.6f} s", file=sys.stderr)
+
+
+def compare(base: dict, new: dict, threshold: float, exponent_tolerance: float) -> List[str]:
+    """Returns a description of each regression of new compared to base."""
+    regressions = []
+    for pattern, operations in new["results"].items():
+        for name, result in operations.items():
+            base_result = base["results"].get(pattern, {}).get(name)
+            if base_result is None:
+                continue
+            base_seconds = dict(zip(base_result["sizes"], base_result["seconds"]))
+            for n, seconds in zip(result["sizes"], result["seconds"]):
+                if n in base_seconds and seconds > threshold * base_seconds[n]:
+                    regressions.append(
+                        f"{pattern} {name} n={n}: {seconds:.6f} s vs {base_seconds[n]:.6f} s "
+                        f"({seconds / base_seconds[n]:.2f}x)")
+            if None in (result["exponent"], base_result["exponent"]):
+                continue
+            if result["exponent"] > base_result["exponent"] + exponent_tolerance:
+                regressions.append(
+                    f"{pattern} {name}: exponent {result['exponent']:.2f} vs "
+                    f"{base_result['exponent']:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="time the operations")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[10**k for k in range(2, 7)])
+    run_parser.add_argument("--patterns", nargs="+", choices=PATTERNS, default=PATTERNS)
+    run_parser.add_argument("--operations", nargs="+", choices=list(OPERATIONS),
+                            default=list(OPERATIONS))
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--fit-min", type=int, default=1000)
+    run_parser.add_argument("--output", help="json file, by default printed to stdout")
+    compare_parser = commands.add_parser("compare", help="flag regressions between two runs")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=1.25)
+    compare_parser.add_argument("--exponent-tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        try:
+            results = run(args.sizes, args.patterns, args.operations, args.repeat, args.fit_min)
+        except ValueError as error:
+            parser.error(str(error))
+        text = json.dumps(results, indent=2)
+        if args.output:
+            with open(args.output, "w") as file:
+                file.write(text)
+        else:
+            print(text)
+        return
+    with open(args.base) as base_file, open(args.new) as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+    regressions = compare(base, new, args.threshold, args.exponent_tolerance)
+    for regression in regressions:
+        print(regression)
+    print(f"{len(regressions)} regression(s) found.")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,7 +22,6 @@ setuptools.setup(
     url="https://gitlab.int.fm-maschinenbau.de/smartblick/students/productionplanpredictor",
     packages=setuptools.find_packages(exclude=["tests"]),
     install_requires=[
-        "DateTimeRange==1.0.0",
         "pandas==1.1.3",
         "numpy==1.19.2",
         "plotly==4.14.3",
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bitmap representation of heavily fragmented timelines on a fixed time grid.
+"""
+
+from __future__ import annotations
+from typing import Optional, Tuple
+import numpy as np
+from src.conversion import to_ns, to_ns_delta, to_timedelta
+from src.timeline import TimeLine, UnsuficientTimedeltaError
+
+# number of set bits of each byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class BitmapTimeLine:
+    """Timeline storing availability on a grid of equally long slots as a
+    packed bit array, slot i covering [origin + i*resolution, origin + (i+1)*resolution].
+
+    Intersection, union and difference are bitwise AND, OR and AND NOT of
+    the packed bytes, the available time is a popcount. Conversion from and
+    to TimeLine is lossless, as only timelines whose boundaries lie on the
+    grid are accepted. Slots have a positive length, so unlike
+    TimeLine.intersection, the intersection of touching timeranges is empty.
+
+    Examples
+    --------
+    >>> bitmap = BitmapTimeLine.from_timeline(shifts, resolution=pd.Timedelta("5 min"))
+    >>> available = (bitmap - BitmapTimeLine.from_timeline(breaks)).to_timeline()
+    """
+
+    def __init__(self, bits: np.ndarray, origin: int, resolution: int, n_slots: int,
+                 ts_format="%d.%m.%Y %H:%M") -> None:
+        """
+
+        Parameters
+        ----------
+        bits : np.ndarray
+            slots packed with np.packbits, 8 slots per uint8, padding bits being 0
+        origin : int
+            start of the first slot in nanoseconds since epoch
+        resolution : int
+            length of a slot in nanoseconds
+        n_slots : int
+            number of slots
+        ts_format : str, optional
+            timestamp string format, by default "%d.%m.%Y %H:%M"
+        """
+        self.bits = bits
+        self.origin = origin
+        self.resolution = resolution
+        self.n_slots = n_slots
+        self.ts_format = ts_format
+
+    @classmethod
+    def from_timeline(cls, timeline: TimeLine, resolution=5 * 60 * 10**9,
+                      origin: Optional[int] = None) -> BitmapTimeLine:
+        """Creates a bitmap from a timeline.
+
+        Parameters
+        ----------
+        timeline : TimeLine
+            timeline whose boundaries lie on the grid
+        resolution : pd.Timedelta | int, optional
+            length of a slot, by default 5 minutes
+        origin : pd.Timestamp | int, optional
+            start of the grid, by default the start of the timeline rounded down
+            to a multiple of resolution since epoch, so that bitmaps of the
+            same resolution share their grid
+
+        Raises
+        ------
+        ValueError
+            raised when a boundary does not lie on the grid or a timerange is empty.
+        """
+        resolution = to_ns_delta(resolution)
+        starts, ends = timeline._arrays()
+        if origin is None:
+            origin = starts[0] // resolution * resolution if len(starts) else 0
+        origin = to_ns(origin)
+        lo, lo_rest = np.divmod(starts - origin, resolution)
+        hi, hi_rest = np.divmod(ends - origin, resolution)
+        if np.any(lo_rest) or np.any(hi_rest) or np.any(lo < 0):
+            raise ValueError("timeline boundaries must lie on the grid after origin.")
+        if np.any(lo == hi):
+            raise ValueError("timeline must not contain empty timeranges.")
+        n_slots = int(hi[-1]) if len(hi) else 0
+        # +1 at the first slot of each timerange, -1 after its last slot
+        deltas = np.zeros(n_slots + 1, dtype=np.int8)
+        deltas[lo] = 1
+        deltas[hi] -= 1
+        slots = np.cumsum(deltas[:-1], dtype=np.int8).astype(bool)
+        return cls(np.packbits(slots), int(origin), resolution, n_slots, timeline.ts_format)
+
+    def to_timeline(self) -> TimeLine:
+        """Converts the bitmap to a merged TimeLine."""
+        slots = np.unpackbits(self.bits, count=self.n_slots).astype(np.int8)
+        edges = np.diff(np.concatenate(([0], slots, [0])))
+        starts = self.origin + np.flatnonzero(edges == 1) * self.resolution
+        ends = self.origin + np.flatnonzero(edges == -1) * self.resolution
+        return TimeLine._from_ns(starts, ends, self.ts_format, merged=True)
+
+    def __repr__(self) -> str:
+        return (f"BitmapTimeLine(n_slots={self.n_slots}, resolution={to_timedelta(self.resolution)}, "
+                f"timedelta={self.timedelta})")
+
+    def __eq__(self, other: BitmapTimeLine) -> bool:
+        return self.to_timeline() == other.to_timeline()
+
+    @property
+    def is_valid(self) -> bool:
+        return bool(np.any(self.bits))
+
+    @property
+    def timedelta(self):
+        """Available time, i.e the number of set slots times the resolution."""
+        return to_timedelta(int(_POPCOUNT[self.bits].sum(dtype=np.int64)) * self.resolution)
+
+    def _aligned(self, other: BitmapTimeLine) -> Tuple[np.ndarray, np.ndarray, int, int]:
+        """Returns the packed bits of both bitmaps on their common grid,
+        together with its origin and number of slots."""
+        if self.resolution != other.resolution or (self.origin - other.origin) % self.resolution:
+            raise ValueError("bitmaps must share their grid.")
+        if self.origin == other.origin and self.n_slots == other.n_slots:
+            return self.bits, other.bits, self.origin, self.n_slots
+        origin = min(self.origin, other.origin)
+        end = max(self.origin + self.n_slots * self.resolution,
+                  other.origin + other.n_slots * self.resolution)
+        n_slots = (end - origin) // self.resolution
+        return self._expand(origin, n_slots), other._expand(origin, n_slots), origin, n_slots
+
+    def _expand(self, origin: int, n_slots: int) -> np.ndarray:
+        """Packed bits on a larger grid starting at origin."""
+        slots = np.zeros(n_slots, dtype=np.uint8)
+        offset = (self.origin - origin) // self.resolution
+        slots[offset:offset + self.n_slots] = np.unpackbits(self.bits, count=self.n_slots)
+        return np.packbits(slots)
+
+    def _combine(self, other: BitmapTimeLine, operation) -> BitmapTimeLine:
+        bits, other_bits, origin, n_slots = self._aligned(other)
+        return BitmapTimeLine(operation(bits, other_bits), origin, self.resolution, n_slots,
+                              self.ts_format)
+
+    def intersection(self, other: BitmapTimeLine) -> BitmapTimeLine:
+        return self._combine(other, np.bitwise_and)
+
+    def union(self, other: BitmapTimeLine) -> BitmapTimeLine:
+        return self._combine(other, np.bitwise_or)
+
+    def difference(self, other: BitmapTimeLine) -> BitmapTimeLine:
+        return self._combine(other, lambda bits, other_bits: bits & ~other_bits)
+
+    __and__ = intersection
+    __or__ = union
+    __sub__ = difference
+
+    def consume(self, timedelta, update: bool = True) -> BitmapTimeLine | Tuple[BitmapTimeLine]:
+        """Consumes a multiple of the resolution from the bitmap, i.e the slots
+        up to the n-th set slot.
+
+        Raises
+        ------
+        ValueError
+            raised when timedelta is not a multiple of the resolution.
+        UnsuficientTimedeltaError
+            raised when time to consume is greater than available time.
+        """
+        n, rest = divmod(to_ns_delta(timedelta), self.resolution)
+        if rest:
+            raise ValueError("time to consume must be a multiple of the resolution.")
+        counts = np.cumsum(_POPCOUNT[self.bits], dtype=np.int64)
+        available = int(counts[-1]) if len(counts) else 0
+        if n > available:
+            raise UnsuficientTimedeltaError(to_timedelta(available * self.resolution), timedelta)
+        consumed, remaining = self.bits.copy(), self.bits.copy()
+        if n == 0:
+            consumed[:] = 0
+        else:
+            # byte holding the n-th set slot and the position of the slot within it
+            byte = int(np.searchsorted(counts, n, side="left"))
+            before = int(counts[byte - 1]) if byte > 0 else 0
+            position = np.flatnonzero(np.unpackbits(self.bits[byte:byte + 1]))[n - before - 1]
+            mask = (0xFF << (7 - position)) & 0xFF
+            consumed[byte + 1:] = 0
+            consumed[byte] &= mask
+            remaining[:byte] = 0
+            remaining[byte] &= ~mask & 0xFF
+        consumed = BitmapTimeLine(consumed, self.origin, self.resolution, self.n_slots, self.ts_format)
+        if not update:
+            return consumed, BitmapTimeLine(remaining, self.origin, self.resolution,
+                                            self.n_slots, self.ts_format)
+        self.bits = remaining
+        return consumed
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Conversions between timestamps/timedeltas and the int64 nanosecond
+values TimeRange and TimeLine store.
+
+Only the standard library and numpy are used for datetimes, numpy values,
+integers and strings. pandas is imported on first use, i.e for pandas
+inputs, large sequences of strings, strings pandas can parse but the
+standard library cannot, and pd.Timestamp/pd.Timedelta outputs.
+"""
+
+from __future__ import annotations
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import numpy as np
+
+NAT = np.iinfo(np.int64).min
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+# sequences of strings at least this long are parsed by pandas in one call,
+# which is faster than parsing them one by one, even counting the import of pandas
+_PANDAS_MIN_SIZE = 2**15
+# same, if pandas is imported already
+_IMPORTED_PANDAS_MIN_SIZE = 2**7
+
+
+def _pandas():
+    """Imports pandas lazily, so importing the core does not."""
+    import pandas
+    return pandas
+
+
+def _datetime_ns(value: datetime) -> int:
+    epoch = _EPOCH if value.tzinfo is None else _EPOCH_UTC
+    return (value - epoch) // _MICROSECOND * 1000
+
+
+def parse_ns(value: str, format: Optional[str] = None) -> int:
+    """Parses a timestamp string in the given format, or in ISO format if format
+    is None, to nanoseconds since epoch."""
+    if format is not None:
+        return _datetime_ns(datetime.strptime(value, format))
+    try:
+        return _datetime_ns(datetime.fromisoformat(value))
+    except ValueError:
+        return _pandas().Timestamp(value).value
+
+
+def to_ns(timestamp) -> int:
+    """Converts a timestamp to nanoseconds since epoch."""
+    if isinstance(timestamp, (int, np.integer)) and not isinstance(timestamp, bool):
+        return int(timestamp)
+    if isinstance(timestamp, datetime):
+        # pd.Timestamp and pd.NaT hold their value in nanoseconds
+        value = getattr(timestamp, "value", None)
+        return _datetime_ns(timestamp) if value is None else value
+    if isinstance(timestamp, np.datetime64):
+        return int(timestamp.astype("datetime64[ns]").astype(np.int64))
+    if isinstance(timestamp, str):
+        return parse_ns(timestamp)
+    return _pandas().Timestamp(timestamp).value
+
+
+def to_ns_delta(timedelta_) -> int:
+    """Converts a timedelta to nanoseconds."""
+    # np.timedelta64 is a subclass of np.integer
+    if isinstance(timedelta_, np.timedelta64):
+        return int(timedelta_.astype("timedelta64[ns]").astype(np.int64))
+    if isinstance(timedelta_, (int, np.integer)) and not isinstance(timedelta_, bool):
+        return int(timedelta_)
+    if isinstance(timedelta_, timedelta):
+        # pd.Timedelta holds its value in nanoseconds
+        value = getattr(timedelta_, "value", None)
+        return timedelta_ // _MICROSECOND * 1000 if value is None else value
+    return _pandas().Timedelta(timedelta_).value
+
+
+def _to_ns_or_nat(timestamp, ts_format: Optional[str]) -> int:
+    if timestamp is None or (isinstance(timestamp, float) and timestamp != timestamp):
+        return NAT
+    if isinstance(timestamp, str):
+        return parse_ns(timestamp, ts_format)
+    return to_ns(timestamp)
+
+
+def _pandas_ns_array(timestamps, ts_format: Optional[str]) -> np.ndarray:
+    datetimes = _pandas().to_datetime(timestamps, format=ts_format)
+    return np.asarray(datetimes, dtype="datetime64[ns]").view(np.int64)
+
+
+def to_ns_array(timestamps, ts_format: Optional[str] = None) -> np.ndarray:
+    """Converts a sequence of timestamps to nanoseconds since epoch.
+    Missing timestamps are converted to NaT.
+
+    numpy datetime64 arrays, pandas objects and large sequences of strings
+    are converted in one vectorized call, other sequences element by element."""
+    if type(timestamps).__module__.startswith("pandas"):
+        return _pandas_ns_array(timestamps, ts_format)
+    array = np.asarray(timestamps)
+    if array.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if array.dtype.kind == "M":
+        return array.astype("datetime64[ns]").view(np.int64)
+    if array.dtype.kind in "iu":
+        return array.astype(np.int64)
+    if array.size >= (_IMPORTED_PANDAS_MIN_SIZE if "pandas" in sys.modules else _PANDAS_MIN_SIZE):
+        try:
+            return _pandas_ns_array(array.ravel(), ts_format)
+        except (ValueError, TypeError):
+            # e.g strings mixed with datetimes, converted one by one below
+            pass
+    return np.fromiter((_to_ns_or_nat(timestamp, ts_format) for timestamp in array.ravel()),
+                       dtype=np.int64, count=array.size)
+
+
+def to_datetime(ns: int) -> datetime:
+    """Converts nanoseconds since epoch to a naive datetime, truncated to microseconds."""
+    return _EPOCH + timedelta(microseconds=int(ns) // 1000)
+
+
+def to_timestamp(ns: int):
+    """Converts nanoseconds since epoch to a pd.Timestamp."""
+    return _pandas().Timestamp(int(ns))
+
+
+def to_timedelta(ns: int):
+    """Converts nanoseconds to a pd.Timedelta."""
+    return _pandas().Timedelta(value=int(ns))
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Out-of-core ingest of interval files which do not fit in memory.
+
+Each chunk of the file is merged on its own and spilled to disk as a
+sorted run. The runs are then k-way merged block by block, so the memory
+holding the input depends on the chunk size and the number of runs, not
+on the file size. The merged timeline itself is held in memory, and it
+is copied once when its blocks are concatenated, so output memory grows
+with the number of merged timeranges.
+"""
+
+from __future__ import annotations
+from contextlib import closing
+import os
+import tempfile
+from typing import Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.timeline import TimeLine, _merge_arrays
+
+
+def iter_csv_chunks(path: str, start_col: str = "start", end_col: str = "end",
+                    chunksize: int = 10**6, **read_csv_kwargs) -> Iterator[pd.DataFrame]:
+    """Reads the start and end columns of a csv file chunk by chunk. The file
+    is closed once the chunks are exhausted or the iterator is closed, e.g
+    when a consumer stops early."""
+    # closing, as TextFileReader is a context manager only from pandas 1.2 on
+    with closing(pd.read_csv(path, usecols=[start_col, end_col], chunksize=chunksize,
+                             **read_csv_kwargs)) as reader:
+        yield from reader
+
+
+def iter_parquet_chunks(path: str, start_col: str = "start", end_col: str = "end",
+                        chunksize: int = 10**6) -> Iterator[pd.DataFrame]:
+    """Reads the start and end columns of a parquet file batch by batch.
+
+    Raises
+    ------
+    ImportError
+        raised when pyarrow is not installed.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise ImportError("reading parquet files chunk by chunk requires pyarrow.") from error
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunksize, columns=[start_col, end_col]):
+        yield batch.to_pandas()
+
+
+def merge_chunks(chunks: Iterable[pd.DataFrame], start_col: str = "start", end_col: str = "end",
+                 ts_format="%d.%m.%Y %H:%M", block_size: int = 2**16,
+                 spill_dir: Optional[str] = None) -> TimeLine:
+    """Merges the timeranges of DataFrame chunks into one timeline.
+
+    Parameters
+    ----------
+    chunks : Iterable[pd.DataFrame]
+        chunks with a start and an end column, in any order
+    start_col, end_col : str, optional
+        names of the start and end columns, by default "start" and "end"
+    ts_format : str, optional
+        timestamp string format, by default "%d.%m.%Y %H:%M"
+    block_size : int, optional
+        number of timeranges read from each run at once while merging, by default 2**16
+    spill_dir : str, optional
+        directory the sorted runs are written to, by default a temporary directory
+
+    Returns
+    -------
+    TimeLine
+        merged timeline
+    """
+    with tempfile.TemporaryDirectory(dir=spill_dir) as run_dir:
+        paths = []
+        for chunk in chunks:
+            timeline = TimeLine.from_frame(chunk, start_col, end_col, ts_format)
+            if not timeline.is_valid:
+                continue
+            path = os.path.join(run_dir, f"run_{len(paths)}.npy")
+            np.save(path, np.stack((timeline._starts, timeline._ends)))
+            paths.append(path)
+            del timeline
+        runs = [np.load(path, mmap_mode="r") for path in paths]
+        starts, ends = _merge_runs(runs, block_size)
+        del runs
+    return TimeLine._from_ns(starts, ends, ts_format, merged=True)
+
+
+def _merge_runs(runs: List[np.ndarray], block_size: int) -> Tuple[np.ndarray]:
+    """K-way merges sorted runs of merged ranges, each a (2, n) array.
+
+    In each step, the current block of every run is cut at the smallest
+    last start among the blocks. No range left in any run starts before
+    that frontier, so all merged ranges except the last one are final.
+    """
+    positions = [0] * len(runs)
+    out_starts, out_ends = [], []
+    carry_start, carry_end = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    while True:
+        active = [i for i, run in enumerate(runs) if positions[i] < run.shape[1]]
+        if not active:
+            break
+        frontier = min(runs[i][0, min(positions[i] + block_size, runs[i].shape[1]) - 1]
+                       for i in active)
+        starts, ends = [carry_start], [carry_end]
+        for i in active:
+            block = runs[i][:, positions[i]:positions[i] + block_size]
+            stop = np.searchsorted(block[0], frontier, side="right")
+            starts.append(np.asarray(block[0, :stop]))
+            ends.append(np.asarray(block[1, :stop]))
+            positions[i] += stop
+        starts, ends = _merge_arrays(np.concatenate(starts), np.concatenate(ends))
+        out_starts.append(starts[:-1])
+        out_ends.append(ends[:-1])
+        carry_start, carry_end = starts[-1:], ends[-1:]
+    out_starts.append(carry_start)
+    out_ends.append(carry_end)
+    return np.concatenate(out_starts), np.concatenate(out_ends)
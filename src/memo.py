@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bounded LRU cache of the results of timeline operations, keyed by the
+operation, the content fingerprints of the operands and the arguments.
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+import numpy as np
+
+
+class OperationCache:
+    """LRU cache mapping operation keys to the start/end arrays of the
+    resulting timelines, with hit and miss counters.
+
+    The cache is opt-in, results are only memoized while it is set as
+    TimeLine.memo. Keys hold the fingerprints of the operands, which are
+    hashed in O(n) once and then updated by each edit, see
+    TimeLine.fingerprint.
+
+    Examples
+    --------
+    >>> TimeLine.memo = OperationCache(maxsize=1024)
+    >>> shifts.intersection(maintenance)  # computed
+    >>> shifts.intersection(maintenance)  # looked up
+    >>> TimeLine.memo.stats()
+    {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 1024}
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, key: Hashable) -> Optional[Tuple[Tuple[np.ndarray]]]:
+        """Returns the cached result of key, or None on a miss."""
+        result = self._results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self._results.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: Hashable, result: Tuple[Tuple[np.ndarray]]) -> None:
+        """Caches a result, evicting the least recently used one if full."""
+        self._results[key] = result
+        self._results.move_to_end(key)
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._results), "maxsize": self.maxsize}
+
+    def clear(self) -> None:
+        """Removes all results and resets the counters."""
+        self._results.clear()
+        self.hits = self.misses = 0
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parallel consume and intersection jobs over many timelines, e.g one per
+machine, using a process pool.
+
+The timelines are copied once into a block of shared memory. Workers only
+receive a small handle and the index of their timeline, and attach to the
+block instead of unpickling timeranges. Results are sent back as int64
+arrays, i.e without serializing single timeranges.
+"""
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+import os
+import numpy as np
+import pandas as pd
+from src.timeline import TimeLine
+
+
+class SharedHandle(NamedTuple):
+    """Everything a worker needs to attach to shared timelines."""
+    name: str
+    offsets: Tuple[int]
+    ts_formats: Tuple[str]
+
+
+class SharedTimeLines:
+    """Timelines stored in one block of shared memory: the starts of all
+    timelines followed by the ends of all timelines.
+
+    The block is freed on close, or when leaving the with statement.
+
+    Examples
+    --------
+    >>> with SharedTimeLines(timelines) as shared:
+    ...     consumed = parallel_consume(shared, timedeltas)
+    """
+
+    def __init__(self, timelines: Sequence[TimeLine]) -> None:
+        pairs = [timeline._arrays() for timeline in timelines]
+        offsets = np.zeros(len(timelines) + 1, dtype=np.int64)
+        np.cumsum([len(starts) for starts, _ in pairs], out=offsets[1:])
+        total = int(offsets[-1])
+        self._shm = SharedMemory(create=True, size=max(2 * total, 1) * 8)
+        self.handle = SharedHandle(self._shm.name, tuple(offsets.tolist()),
+                                   tuple(timeline.ts_format for timeline in timelines))
+        arrays = np.ndarray((2, total), dtype=np.int64, buffer=self._shm.buf)
+        for i, pair in enumerate(pairs):
+            arrays[:, offsets[i]:offsets[i + 1]] = pair
+        del arrays
+
+    def __len__(self) -> int:
+        return len(self.handle.ts_formats)
+
+    def __enter__(self) -> SharedTimeLines:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Releases the shared memory block."""
+        self._shm.close()
+        self._shm.unlink()
+
+
+def _views(buffer, handle: SharedHandle) -> List[TimeLine]:
+    """Creates the timelines of a handle as views on a shared memory buffer."""
+    offsets = handle.offsets
+    arrays = np.ndarray((2, offsets[-1]), dtype=np.int64, buffer=buffer)
+    return [TimeLine._from_ns(arrays[0, lo:hi], arrays[1, lo:hi], ts_format, merged=True)
+            for lo, hi, ts_format in zip(offsets[:-1], offsets[1:], handle.ts_formats)]
+
+
+def _run_jobs(handle: SharedHandle, job: Callable, items: List[Tuple[int, Any]]
+              ) -> List[Tuple[np.ndarray]]:
+    """Runs a job on the shared timelines of some indices in a worker."""
+    shm = SharedMemory(handle.name)
+    timelines = _views(shm.buf, handle)
+    try:
+        results = []
+        for i, arg in items:
+            result = job(timelines[i], arg, timelines)
+            # copy, the views must not outlive the attached block
+            results.append((result._starts.copy(), result._ends.copy(), result.ts_format))
+        return results
+    finally:
+        del timelines
+        try:
+            shm.close()
+        except BufferError:
+            # views are still referenced by the traceback of a failed job,
+            # the block is unmapped once the traceback is gone
+            pass
+
+
+def _consume(timeline: TimeLine, timedelta: pd.Timedelta, timelines: List[TimeLine]) -> TimeLine:
+    return timeline.consume(timedelta, update=False)[0]
+
+
+def _intersection(timeline: TimeLine, other: int, timelines: List[TimeLine]) -> TimeLine:
+    return timeline.intersection(timelines[other])
+
+
+def _default_chunksize(n_items: int, max_workers: Optional[int]) -> int:
+    """About four tasks per worker, max_workers defaulting to the number of
+    CPUs like in ProcessPoolExecutor."""
+    return max(1, n_items // (4 * (max_workers or os.cpu_count() or 1)))
+
+
+def _run(shared: SharedTimeLines, job: Callable, items: List[Tuple[int, Any]],
+         max_workers: Optional[int], chunksize: Optional[int]) -> List[TimeLine]:
+    """Distributes the items over a process pool, chunksize items per task."""
+    if chunksize is None:
+        chunksize = _default_chunksize(len(items), max_workers)
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run_jobs, shared.handle, job, chunk) for chunk in chunks]
+        results = [result for future in futures for result in future.result()]
+    return [TimeLine._from_ns(starts, ends, ts_format, merged=True)
+            for starts, ends, ts_format in results]
+
+
+def parallel_consume(shared: SharedTimeLines, timedeltas: Sequence[pd.Timedelta],
+                     max_workers: Optional[int] = None,
+                     chunksize: Optional[int] = None) -> List[TimeLine]:
+    """Consumes timedeltas[i] from the i-th shared timeline in parallel.
+
+    The shared timelines are not modified.
+
+    Parameters
+    ----------
+    shared : SharedTimeLines
+        timelines, e.g one per machine
+    timedeltas : Sequence[pd.Timedelta]
+        time to consume from each timeline
+    max_workers : int, optional
+        number of worker processes, by default the number of CPUs
+    chunksize : int, optional
+        number of timelines handled per task, by default about four tasks per worker
+
+    Returns
+    -------
+    List[TimeLine]
+        consumed timeline of each shared timeline
+
+    Raises
+    ------
+    UnsuficientTimedeltaError
+        raised when a timedelta is greater than the time of its timeline.
+    """
+    if len(timedeltas) != len(shared):
+        raise ValueError(f"got {len(timedeltas)} timedeltas for {len(shared)} timelines.")
+    items = [(i, pd.Timedelta(timedelta)) for i, timedelta in enumerate(timedeltas)]
+    return _run(shared, _consume, items, max_workers, chunksize)
+
+
+def parallel_intersection(shared: SharedTimeLines, pairs: Sequence[Tuple[int, int]],
+                          max_workers: Optional[int] = None,
+                          chunksize: Optional[int] = None) -> List[TimeLine]:
+    """Intersects pairs of shared timelines, given by their indices, in parallel.
+
+    Returns
+    -------
+    List[TimeLine]
+        intersection of each pair
+    """
+    items = [(i, j) for i, j in pairs]
+    return _run(shared, _intersection, items, max_workers, chunksize)
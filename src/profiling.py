@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Opt-in instrumentation of the TimeLine hot paths.
+
+While a profile is collected, every instrumented operation records its
+wall time, the number of TimeRange objects created during the call and
+the number of timeranges of its input and output timelines. The
+instrumented methods are only wrapped while a profile is collected.
+Nested profiles all record the calls made while they are collected.
+"""
+
+from __future__ import annotations
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+# profiles being collected, innermost last
+active: List[Profile] = []
+# (class, name, function) of the instrumented methods
+_registry: List[tuple] = []
+
+
+class OperationStats:
+    """Totals of the calls of one operation."""
+
+    __slots__ = ("calls", "seconds", "timeranges_created", "input_ranges", "output_ranges")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.timeranges_created = 0
+        self.input_ranges = 0
+        self.output_ranges = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Profile:
+    """Statistics per operation and trace events collected by profile().
+
+    Times include nested instrumented calls, e.g inter_diff includes merging
+    its operands. Counts are exact also when many threads use the timelines.
+    """
+
+    def __init__(self) -> None:
+        self.stats: Dict[str, OperationStats] = {}
+        self.events: List[dict] = []
+        self.timeranges_created = 0
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _record(self, name: str, start: float, seconds: float, created: int,
+                input_ranges: int, output_ranges: int) -> None:
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = OperationStats()
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.timeranges_created += created
+            stats.input_ranges += input_ranges
+            stats.output_ranges += output_ranges
+            self.events.append({
+                "name": name, "ph": "X", "pid": 0, "tid": threading.get_ident(),
+                "ts": (start - self._origin) * 1e6, "dur": seconds * 1e6,
+                "args": {"input_ranges": input_ranges, "output_ranges": output_ranges,
+                         "timeranges_created": created}})
+
+    def report(self) -> str:
+        """Returns the statistics as a table, slowest operation first."""
+        lines = [f"{'operation':<16} {'calls':>8} {'time [s]':>10} {'timeranges':>11} "
+                 f"{'input':>10} {'output':>10}"]
+        for name, stats in sorted(self.stats.items(), key=lambda item: -item[1].seconds):
+            lines.append(f"{name:<16} {stats.calls:>8} {stats.seconds:>10.4f} "
+                         f"{stats.timeranges_created:>11} {stats.input_ranges:>10} "
+                         f"{stats.output_ranges:>10}")
+        return "\n".join(lines)
+
+    def to_chrome_trace(self, path: str) -> None:
+        """Writes the calls as Chrome trace events, viewable in chrome://tracing or Perfetto."""
+        with open(path, "w") as file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, file)
+
+
+def _size(value) -> int:
+    """Number of timeranges of a timeline or a tuple/list of timelines, else 0."""
+    if isinstance(value, (tuple, list)):
+        return sum(_size(elem) for elem in value)
+    return len(value) if hasattr(value, "_starts") else 0
+
+
+@contextmanager
+def profile() -> Iterator[Profile]:
+    """Collects statistics of the instrumented TimeLine operations.
+
+    Methods bound before entering, e.g f = timeline.consume, are not recorded.
+
+    Examples
+    --------
+    >>> with profile() as stats:
+    ...     plan(jobs, timeline)
+    >>> print(stats.report())
+    >>> stats.to_chrome_trace("plan.json")
+    """
+    collected = Profile()
+    if not active:
+        for owner, name, func in _registry:
+            setattr(owner, name, _wrap(name, func))
+    active.append(collected)
+    try:
+        yield collected
+    finally:
+        active.remove(collected)
+        if not active:
+            for owner, name, func in _registry:
+                setattr(owner, name, func)
+
+
+class instrumented:
+    """Decorator registering a TimeLine method for instrumentation.
+
+    The method itself is left unchanged. Only while a profile is collected
+    it is replaced by a wrapper recording its calls, so instrumentation
+    costs nothing when it is switched off.
+    """
+
+    def __init__(self, func) -> None:
+        self.func = func
+
+    def __set_name__(self, owner, name: str) -> None:
+        _registry.append((owner, name, self.func))
+        setattr(owner, name, self.func)
+
+
+def _wrap(name: str, func):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        profiles = tuple(active)
+        if not profiles:
+            return func(self, *args, **kwargs)
+        input_ranges = _size(self) + sum(_size(arg) for arg in args)
+        created = [stats.timeranges_created for stats in profiles]
+        start = time.perf_counter()
+        result = func(self, *args, **kwargs)
+        seconds = time.perf_counter() - start
+        output_ranges = _size(result)
+        for stats, before in zip(profiles, created):
+            stats._record(name, start, seconds, stats.timeranges_created - before,
+                          input_ranges, output_ranges)
+        return result
+    return wrapper
+
+
+def count_timerange() -> None:
+    """Counts a created TimeRange in the active profiles, called only if there are any."""
+    for stats in tuple(active):
+        with stats._lock:
+            stats.timeranges_created += 1
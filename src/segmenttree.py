@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Max segment tree used to find the first timerange of a timeline which
+is long enough for a given duration.
+"""
+
+from __future__ import annotations
+import numpy as np
+
+
+class MaxSegmentTree:
+    """Segment tree over an array of integers, answering which is the first
+    element not smaller than a threshold in O(log n).
+
+    Leaves are stored at tree[size:size+n], the maximum of the children of
+    node i at tree[i]. Padding leaves hold the smallest int64 value.
+    """
+
+    EMPTY = np.iinfo(np.int64).min
+
+    def __init__(self, values: np.ndarray) -> None:
+        self._n = len(values)
+        self._size = 1
+        while self._size < self._n:
+            self._size *= 2
+        self._tree = np.full(2 * self._size, self.EMPTY, dtype=np.int64)
+        self._tree[self._size:self._size + self._n] = values
+        # build level by level, each level in one vectorized step
+        lo = self._size // 2
+        while lo >= 1:
+            self._tree[lo:2 * lo] = np.maximum(self._tree[2 * lo:4 * lo:2],
+                                               self._tree[2 * lo + 1:4 * lo:2])
+            lo //= 2
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int) -> int:
+        return int(self._tree[self._size + i])
+
+    @property
+    def max(self) -> int:
+        """Largest element, or EMPTY if the tree is empty."""
+        return int(self._tree[1]) if self._n > 0 else self.EMPTY
+
+    def update(self, i: int, value: int) -> None:
+        """Sets element i to value in O(log n)."""
+        node = self._size + i
+        self._tree[node] = value
+        node //= 2
+        while node >= 1:
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+            node //= 2
+
+    def first_at_least(self, threshold: int, start: int = 0) -> int:
+        """Returns the index of the first element at or after start which is
+        not smaller than threshold, or -1 if there is none."""
+        if start >= self._n:
+            return -1
+        tree, node = self._tree, self._size + start
+        while tree[node] < threshold:
+            # move on to the subtree right of the current node
+            while node & 1:
+                node //= 2
+            if node == 0:
+                return -1
+            node += 1
+        # descend to the leftmost leaf not smaller than threshold
+        while node < self._size:
+            node = 2 * node if tree[2 * node] >= threshold else 2 * node + 1
+        return node - self._size
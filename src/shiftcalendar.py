@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recurring shift calendars which are materialized lazily, week by week.
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from datetime import datetime, time
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.conversion import to_ns, to_ns_delta
+from src.timerange import TimeRange
+from src.timeline import TimeLine, UnsuficientTimedeltaError
+
+_DAY = pd.Timedelta(value=1, unit="d").value
+_WEEK = 7 * _DAY
+# first monday after epoch, weeks are counted from it
+_MONDAY = pd.Timestamp("1970-01-05").value
+
+
+class ShiftCalendar:
+    """Weekly shift pattern with exception dates, e.g holidays or extra shifts.
+
+    TimeRanges are generated lazily week by week. Recently used weeks are
+    kept in a bounded LRU cache, so memory does not grow with the planning
+    horizon. Shifts ending at or before their start, e.g ("22:00", "06:00"),
+    end on the next day.
+
+    Examples
+    --------
+    >>> calendar = ShiftCalendar(
+    ...     {weekday: [("06:00", "09:30"), ("10:00", "14:00")] for weekday in range(5)},
+    ...     exceptions={"24.12.2021": [], "25.12.2021": [("08:00", "12:00")]})
+    """
+
+    def __init__(self,
+                 weekly_shifts: Dict[int, List[Tuple[str | time]]],
+                 exceptions: Optional[Dict[str | pd.Timestamp, List[Tuple[str | time]]]] = None,
+                 time_format: str = "%H:%M",
+                 date_format: str = "%d.%m.%Y",
+                 ts_format: str = "%d.%m.%Y %H:%M",
+                 cache_size: int = 16) -> None:
+        """
+
+        Parameters
+        ----------
+        weekly_shifts : Dict[int, List[Tuple[str | time]]]
+            shifts (start, end) of each weekday, monday being 0 and sunday 6
+        exceptions : Dict[str | pd.Timestamp, List[Tuple[str | time]]], optional
+            shifts replacing the weekly shifts on a date, an empty list for a day off, by default None
+        time_format : str, optional
+            format of shift times given as strings, by default "%H:%M"
+        date_format : str, optional
+            format of exception dates given as strings, by default "%d.%m.%Y"
+        ts_format : str, optional
+            timestamp string format of the generated timelines, by default "%d.%m.%Y %H:%M"
+        cache_size : int, optional
+            number of materialized weeks kept in memory, by default 16
+        """
+        self.time_format = time_format
+        self.ts_format = ts_format
+        self.cache_size = cache_size
+        starts, ends = [], []
+        for weekday, shifts in weekly_shifts.items():
+            if not 0 <= weekday <= 6:
+                raise ValueError(f"weekday must be between 0 and 6, got {weekday}.")
+            day_starts, day_ends = self._day_shifts(weekday * _DAY, shifts)
+            starts.extend(day_starts)
+            ends.extend(day_ends)
+        pattern = TimeLine._from_ns(np.array(starts, dtype=np.int64),
+                                    np.array(ends, dtype=np.int64))
+        self._pattern_starts, self._pattern_ends = pattern._starts, pattern._ends
+        self._exceptions = {}
+        for date, shifts in (exceptions or {}).items():
+            if isinstance(date, str):
+                date = pd.to_datetime(date, format=date_format)
+            day = pd.Timestamp(date).normalize().value
+            self._exceptions[day] = tuple(np.array(x, dtype=np.int64)
+                                          for x in self._day_shifts(day, shifts))
+        self._exception_days = np.array(sorted(self._exceptions), dtype=np.int64)
+        self._weeks = OrderedDict()
+
+    def _day_shifts(self, day: int, shifts: List[Tuple[str | time]]) -> Tuple[List[int]]:
+        """Converts the shifts of a day to start/end lists in nanoseconds."""
+        starts, ends = [], []
+        for start, end in shifts:
+            start, end = day + self._offset(start), day + self._offset(end)
+            if end <= start:
+                end += _DAY
+            starts.append(start)
+            ends.append(end)
+        return starts, ends
+
+    def _offset(self, shift_time: str | time) -> int:
+        """Converts a time of day to nanoseconds since midnight."""
+        if isinstance(shift_time, str):
+            shift_time = datetime.strptime(shift_time, self.time_format).time()
+        seconds = (shift_time.hour * 60 + shift_time.minute) * 60 + shift_time.second
+        return seconds * 10**9 + shift_time.microsecond * 10**3
+
+    @staticmethod
+    def _week_of(timestamp: int) -> int:
+        return (timestamp - _MONDAY) // _WEEK
+
+    def _week(self, week: int) -> Tuple[np.ndarray]:
+        """Returns the merged shifts starting in a week, using the LRU cache."""
+        if week in self._weeks:
+            self._weeks.move_to_end(week)
+            return self._weeks[week]
+        week_start = _MONDAY + week * _WEEK
+        starts, ends = self._pattern_starts + week_start, self._pattern_ends + week_start
+        lo, hi = np.searchsorted(self._exception_days, [week_start, week_start + _WEEK])
+        if hi > lo:
+            starts, ends = [starts], [ends]
+            for day in self._exception_days[lo:hi]:
+                # replace the shifts starting on the exception day
+                keep = (starts[0] < day) | (starts[0] >= day + _DAY)
+                starts[0], ends[0] = starts[0][keep], ends[0][keep]
+                starts.append(self._exceptions[day][0])
+                ends.append(self._exceptions[day][1])
+            timeline = TimeLine._from_ns(np.concatenate(starts), np.concatenate(ends))
+            starts, ends = timeline._starts, timeline._ends
+        self._weeks[week] = starts, ends
+        if len(self._weeks) > self.cache_size:
+            self._weeks.popitem(last=False)
+        return starts, ends
+
+    def _is_exhausted(self, week: int) -> bool:
+        """Tests whether no shift starts in or after the week."""
+        last_exception = self._exception_days[-1] if len(self._exception_days) else None
+        return len(self._pattern_starts) == 0 and (
+            last_exception is None or last_exception < _MONDAY + week * _WEEK)
+
+    def iter_timeranges(self, start: pd.Timestamp,
+                        end: Optional[pd.Timestamp] = None) -> Iterator[TimeRange]:
+        """Generates the shifts between start and end, or without end if end is None.
+
+        Shifts overlapping start or end are clipped.
+        """
+        start = to_ns(start)
+        end = None if end is None else to_ns(end)
+        # shifts of the previous week may last into the week of start
+        week = self._week_of(start) - 1
+        while end is None or _MONDAY + week * _WEEK < end:
+            if self._is_exhausted(week):
+                return
+            starts, ends = self._week(week)
+            for range_start, range_end in zip(starts, ends):
+                if range_end <= start:
+                    continue
+                if end is not None and range_start >= end:
+                    return
+                yield TimeRange._from_ns(max(range_start, start),
+                                         range_end if end is None else min(range_end, end),
+                                         self.ts_format)
+            week += 1
+
+    def window(self, start: pd.Timestamp, end: pd.Timestamp) -> TimeLine:
+        """Materializes the shifts between start and end as a timeline."""
+        start, end = to_ns(start), to_ns(end)
+        if start > end:
+            raise ValueError(
+                "time inversion found: {:s} > {:s}".format(
+                    str(pd.Timestamp(start)), str(pd.Timestamp(end))))
+        weeks = range(self._week_of(start) - 1, self._week_of(end) + 1)
+        starts, ends = zip(*(self._week(week) for week in weeks))
+        timeline = TimeLine._from_ns(np.concatenate(starts), np.concatenate(ends), self.ts_format)
+        return timeline._between(start, end)
+
+    def consume(self, timedelta: pd.Timedelta, start: pd.Timestamp) -> TimeLine:
+        """Consumes a certain amount of time from the shifts after start.
+
+        The materialized window is doubled until it holds enough time.
+
+        Raises
+        ------
+        UnsuficientTimedeltaError
+            raised when all shifts after start hold less time than timedelta.
+        """
+        start_ns, timedelta_ns = to_ns(start), to_ns_delta(timedelta)
+        weeks = 1
+        while True:
+            end = _MONDAY + (self._week_of(start_ns) + weeks) * _WEEK
+            window = self.window(start, pd.Timestamp(end))
+            if window.timedelta.value >= timedelta_ns:
+                return window.consume(timedelta, update=False)[0]
+            if self._is_exhausted(self._week_of(end) - 1):
+                raise UnsuficientTimedeltaError(window.timedelta, timedelta)
+            weeks *= 2
+
+    def split(self, separator: pd.Timestamp, start: pd.Timestamp,
+              end: pd.Timestamp) -> Tuple[TimeLine]:
+        """Splits the shifts between start and end into two timelines according to separator."""
+        return self.window(start, separator), self.window(separator, end)
+
+    def intersection(self, other: TimeLine) -> TimeLine:
+        """Calculates the intersection with a timeline, materializing only its span."""
+        if not other.is_valid:
+            return TimeLine(ts_format=self.ts_format)
+        return self.window(other.start_time, other.end_time).intersection(other)
+
+    def difference(self, other: TimeLine) -> TimeLine:
+        """Calculates the part of a timeline which does not lie within any shift."""
+        if not other.is_valid:
+            return TimeLine(ts_format=self.ts_format)
+        return other.difference(self.window(other.start_time, other.end_time))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Timelines backed by an iterator of timeranges, e.g a shift calendar
+generator or a chunked file reader.
+"""
+
+from __future__ import annotations
+from itertools import islice
+from typing import Iterable, Tuple
+import numpy as np
+import pandas as pd
+from src.conversion import to_ns, to_ns_delta
+from src.timerange import TimeRange
+from src.timeline import TimeLine, UnsuficientTimedeltaError
+
+_MAX = np.iinfo(np.int64).max
+
+
+class StreamingTimeLine:
+    """Timeline which pulls its timeranges from an iterator only when needed.
+
+    The iterator must yield TimeRanges, tuples or whole TimeLines (e.g one
+    per chunk of a file) ordered by start. They may overlap or be adjacent.
+    Pulled timeranges are kept in a buffer, which is released as soon as
+    they are consumed or split off, so unbounded sources can be used.
+
+    Raises
+    ------
+    UnsuficientTimedeltaError
+        raised when time to consume is greater than the time left in the source.
+    """
+
+    def __init__(self,
+                 timeranges: Iterable[TimeRange | Tuple[str] | TimeLine],
+                 ts_format="%d.%m.%Y %H:%M",
+                 chunk_size: int = 1024) -> None:
+        """
+
+        Parameters
+        ----------
+        timeranges : Iterable[TimeRange | Tuple[str] | TimeLine]
+            timeranges ordered by start
+        ts_format : str, optional
+            timestamp string format, by default "%d.%m.%Y %H:%M"
+        chunk_size : int, optional
+            number of items pulled from the iterator at once, by default 1024
+        """
+        self.ts_format = ts_format
+        self.chunk_size = chunk_size
+        self._source = iter(timeranges)
+        self._buffer = TimeLine(ts_format=ts_format)
+        self._last_start = np.iinfo(np.int64).min
+        self._exhausted = False
+
+    def __repr__(self) -> str:
+        return f"StreamingTimeLine(buffered={len(self._buffer)}, exhausted={self._exhausted})"
+
+    @property
+    def buffered(self) -> TimeLine:
+        """Timeranges pulled from the iterator but not consumed yet."""
+        return self._buffer.copy()
+
+    @property
+    def is_exhausted(self) -> bool:
+        return self._exhausted and not self._buffer.is_valid
+
+    @property
+    def _settled(self) -> int:
+        """Datetime before which no timerange still in the iterator can start."""
+        return _MAX if self._exhausted else self._last_start
+
+    def _pull(self) -> None:
+        """Loads the next chunk of the iterator into the buffer."""
+        starts, ends = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        n_items = 0
+        for n_items, item in enumerate(islice(self._source, self.chunk_size), start=1):
+            if isinstance(item, TimeLine):
+                item_starts, item_ends = item._arrays()
+                starts.append(item_starts)
+                ends.append(item_ends)
+                continue
+            if isinstance(item, (list, tuple)):
+                item = TimeRange(*item, format=self.ts_format)
+            if item.is_set():
+                starts.append(np.array([item.start_ns], dtype=np.int64))
+                ends.append(np.array([item.end_ns], dtype=np.int64))
+        if n_items == 0:
+            self._exhausted = True
+            return
+        starts, ends = np.concatenate(starts), np.concatenate(ends)
+        if len(starts) == 0:
+            return
+        if starts[0] < self._last_start or np.any(np.diff(starts) < 0):
+            raise ValueError("timeranges must be ordered by start.")
+        self._last_start = starts[-1]
+        self._buffer = TimeLine._from_ns(np.concatenate((self._buffer._starts, starts)),
+                                         np.concatenate((self._buffer._ends, ends)),
+                                         self.ts_format)
+
+    def _release(self, remaining: TimeLine) -> None:
+        """Keeps only the remaining timeranges, copied so the consumed ones are freed."""
+        self._buffer = TimeLine._from_ns(remaining._starts.copy(), remaining._ends.copy(),
+                                         self.ts_format, merged=True)
+
+    def consume(self, timedelta: pd.Timedelta) -> TimeLine:
+        """Consumes a certain amount of time, pulling only as many timeranges as needed."""
+        timedelta_ns = to_ns_delta(timedelta)
+        while not self._exhausted and self._buffer._position_ns(self._settled) < timedelta_ns:
+            self._pull()
+        if self._buffer.timedelta.value < timedelta_ns:
+            raise UnsuficientTimedeltaError(self._buffer.timedelta, timedelta)
+        consumed, remaining = self._buffer.consume(timedelta, update=False)
+        self._release(remaining)
+        return consumed
+
+    def split(self, separator: pd.Timestamp) -> Tuple[TimeLine, StreamingTimeLine]:
+        """Splits off the timeline left of separator. The stream itself is
+        advanced to separator and returned as right part."""
+        separator_ns = to_ns(separator)
+        while not self._exhausted and self._settled < separator_ns:
+            self._pull()
+        left, right = self._buffer.split(separator)
+        self._release(right)
+        return left, self
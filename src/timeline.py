@@ -7,17 +7,156 @@ Created on Mon Jul 12 16:40:31 2021
 """
 
 from __future__ import annotations
-from typing import List, Tuple, Optional
+from typing import TYPE_CHECKING, List, NamedTuple, Tuple, Optional
 from pprint import pformat
+import struct
+import threading
 import numpy as np
-import pandas as pd
 from src.timerange import TimeRange
+from src.conversion import to_datetime, to_ns, to_ns_delta, to_ns_array, to_timedelta, to_timestamp
+from src.segmenttree import MaxSegmentTree
+from src.memo import OperationCache
+from src.profiling import instrumented
+
+if TYPE_CHECKING:
+    import pandas as pd
 # import plotly.express as px
 
 
+_NAT = _MIN = np.iinfo(np.int64).min
+_MAX = np.iinfo(np.int64).max
+
+# binary file layout: header, utf-8 ts_format, padding to _ALIGNMENT,
+# then all starts followed by all ends as little-endian int64
+_MAGIC = b"TIMELINE"
+_VERSION = 1
+_HEADER = struct.Struct("<8sHBxQH")
+_ALIGNMENT = 64
+
+# seeds of the two 64-bit lanes of the fingerprint
+_LANES = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xD1B54A32D192ED03))
+_MASK = 2**64 - 1
+
+
+def _sorted_ns_array(timestamps) -> np.ndarray:
+    """Converts sorted timestamps to nanoseconds since epoch."""
+    timestamps = to_ns_array(timestamps)
+    if np.any(timestamps == _NAT):
+        raise ValueError("timestamps must not be missing.")
+    if np.any(np.diff(timestamps) < 0):
+        raise ValueError("timestamps must be sorted chronologically.")
+    return timestamps
+
+
+def _merge_arrays(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray]:
+    """Merges overlapping or adjacent ranges given as start/end arrays."""
+    order = np.argsort(starts, kind="mergesort")
+    starts, ends = starts[order], ends[order]
+    running_end = np.maximum.accumulate(ends)
+    is_first = np.empty(len(starts), dtype=bool)
+    is_first[0] = True
+    np.greater(starts[1:], running_end[:-1], out=is_first[1:])
+    first = np.flatnonzero(is_first)
+    return starts[first], np.maximum.reduceat(ends, first)
+
+
+def _intersect_arrays(a_starts: np.ndarray, a_ends: np.ndarray,
+                      b_starts: np.ndarray, b_ends: np.ndarray) -> Tuple[np.ndarray]:
+    """Computes the intersection of each pair of ranges of two merged sets
+    which overlap or touch, like TimeRange.intersection. Touching ranges
+    intersect in a zero-length range.
+
+    Ranges of a merged set are disjoint, so the ranges of b intersecting
+    a range of a are consecutive and found by bisection.
+    """
+    # b[lo[i]:hi[i]] ends at or after a[i] starts and starts at or before a[i] ends
+    lo = np.searchsorted(b_ends, a_starts, side="left")
+    hi = np.searchsorted(b_starts, a_ends, side="right")
+    counts = np.maximum(hi - lo, 0)
+    i = np.repeat(np.arange(len(a_starts)), counts)
+    j = np.arange(counts.sum()) + np.repeat(lo - np.cumsum(counts) + counts, counts)
+    return np.maximum(a_starts[i], b_starts[j]), np.minimum(a_ends[i], b_ends[j])
+
+
+def _subtract_arrays(a_starts: np.ndarray, a_ends: np.ndarray,
+                     b_starts: np.ndarray, b_ends: np.ndarray) -> Tuple[np.ndarray]:
+    """Computes the difference of two merged sets of ranges in a single sweep
+    over their boundaries, like TimeRange.differences.
+
+    The boundaries of each set form a sorted run, so the stable sort only
+    has to merge two runs, which takes linear time. Zero-length overlaps do
+    not cut a range, and zero-length ranges of a are always kept.
+    """
+    a_times, a_deltas = _interleave(a_starts, a_ends)
+    b_times, b_deltas = _interleave(b_starts, b_ends)
+    times = np.concatenate((a_times, b_times))
+    order = np.argsort(times, kind="stable")
+    times = times[order]
+    in_a = np.cumsum(np.concatenate((a_deltas, np.zeros_like(b_deltas)))[order])[:-1] > 0
+    in_b = np.cumsum(np.concatenate((np.zeros_like(a_deltas), b_deltas))[order])[:-1] > 0
+    # elementary segments between consecutive boundaries
+    seg_starts, seg_ends = times[:-1], times[1:]
+    diff = (seg_ends > seg_starts) & in_a & ~in_b
+    starts, ends = _coalesce_arrays(seg_starts[diff], seg_ends[diff])
+    points = a_starts[a_starts == a_ends]
+    if len(points) == 0:
+        return starts, ends
+    # zero-length ranges of a do not touch any other range of a
+    starts, ends = np.concatenate((starts, points)), np.concatenate((ends, points))
+    order = np.argsort(starts, kind="stable")
+    return starts[order], ends[order]
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, a bijection of uint64 spreading every input bit."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _range_hash_sums(starts: np.ndarray, ends: np.ndarray) -> Tuple[int]:
+    """Sums modulo 2**64 of a 64-bit hash of each range, one per lane.
+
+    The sums do not depend on the order of the ranges, so the sums of a set
+    of ranges are updated by subtracting the removed and adding the added
+    ranges.
+    """
+    starts = np.asarray(starts, dtype=np.int64).view(np.uint64)
+    ends = np.asarray(ends, dtype=np.int64).view(np.uint64)
+    return tuple(int(np.sum(_mix(_mix(starts ^ lane) ^ ends), dtype=np.uint64)) for lane in _LANES)
+
+
+def _interleave(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray]:
+    """Returns the sorted boundaries of merged ranges together with
+    +1 for each start and -1 for each end."""
+    times = np.empty(2 * len(starts), dtype=np.int64)
+    times[0::2], times[1::2] = starts, ends
+    deltas = np.tile(np.array([1, -1], dtype=np.int8), len(starts))
+    return times, deltas
+
+
+def _coalesce_arrays(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray]:
+    """Joins sorted, non-overlapping ranges which are adjacent."""
+    if len(starts) == 0:
+        return starts, ends
+    return _merge_arrays(starts, ends)
+
+
 class TimeLine:
     """Class representing a timeline, i.e a set of ordered timeranges.
 
+    Timeranges are stored as two int64 arrays holding the start and end
+    of each timerange in nanoseconds since epoch. TimeRange objects are
+    only created when the timeline is indexed or iterated. The arrays are
+    never modified in place, so timelines may share them.
+
+    Methods modifying the timeline hold its reentrant lock, so they may be
+    called from many threads at once, e.g reserve, release and consume.
+    Queries reading both arrays, e.g split, position_of or iteration, hold
+    it as well or read both arrays at once with _arrays, so they see a
+    single version of the timeline. Operations on two timelines read the
+    other one before locking their own, so they cannot deadlock.
+
     Returns
     -------
     None
@@ -29,6 +168,11 @@ class TimeLine:
     """
 
     NOT_A_TIMELINE = "NaTL"
+    # debug mode: every access to a cached aggregate recomputes it and
+    # raises an AssertionError if the cached value is stale
+    validate_cache = False
+    # opt-in memoization of inter_diff, split and consume(update=False)
+    memo: Optional[OperationCache] = None
 
     def __init__(self,
                  timeranges: Optional[List[TimeRange | Tuple[str]]] = None,
@@ -45,33 +189,251 @@ class TimeLine:
         merged : bool, optional
             whether the passed timeranges are merged, i.e do not overlap and are ordered chronologically, by default False
         """
-        timeranges = timeranges or []
-        self.timeranges = [TimeRange(*elem, format=ts_format) if isinstance(
-            elem, (list, tuple)) else elem for elem in timeranges]
-        assert len(self.timeranges) == len(timeranges)
         self.ts_format = ts_format
-        self._merged = merged
+        self._lock = threading.RLock()
+        self._set_timeranges(timeranges or [], merged)
         self.merge()
 
+    @classmethod
+    def _from_ns(cls, starts: np.ndarray, ends: np.ndarray,
+                 ts_format="%d.%m.%Y %H:%M", merged: bool = False) -> TimeLine:
+        """Creates a timeline from start/end arrays in nanoseconds since epoch."""
+        timeline = cls.__new__(cls)
+        timeline.ts_format = ts_format
+        timeline._lock = threading.RLock()
+        timeline._set_arrays(starts, ends, merged)
+        timeline.merge()
+        return timeline
+
+    @classmethod
+    def from_arrays(cls, starts, ends, ts_format="%d.%m.%Y %H:%M", merged: bool = False) -> TimeLine:
+        """Creates a timeline from sequences of start and end timestamps.
+
+        datetime64 arrays, pandas objects and large sequences of strings are
+        parsed in a single vectorized call each, see to_ns_array. Pairs with
+        a missing start or end are ignored like unset TimeRanges.
+
+        Parameters
+        ----------
+        starts, ends : array-like
+            start and end timestamps as strings, datetimes or datetime64 values
+        ts_format : str, optional
+            timestamp string format, by default "%d.%m.%Y %H:%M"
+        merged : bool, optional
+            whether the timeranges are merged, by default False
+
+        Raises
+        ------
+        ValueError
+            raised when the sequences differ in length or a start is after its end.
+        """
+        starts, ends = to_ns_array(starts, ts_format), to_ns_array(ends, ts_format)
+        if len(starts) != len(ends):
+            raise ValueError(
+                f"got {len(starts)} start timestamps but {len(ends)} end timestamps.")
+        is_set = (starts != _NAT) & (ends != _NAT)
+        starts, ends = starts[is_set], ends[is_set]
+        inverted = np.flatnonzero(starts > ends)
+        if len(inverted) > 0:
+            raise ValueError(
+                "time inversion found: {:s} > {:s}".format(
+                    str(to_datetime(starts[inverted[0]])),
+                    str(to_datetime(ends[inverted[0]]))
+                )
+            )
+        return cls._from_ns(starts, ends, ts_format, merged)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, start_col: str = "start", end_col: str = "end",
+                   ts_format="%d.%m.%Y %H:%M", merged: bool = False) -> TimeLine:
+        """Creates a timeline from the start and end columns of a DataFrame."""
+        return cls.from_arrays(df[start_col], df[end_col], ts_format, merged)
+
+    @classmethod
+    def from_interval_index(cls, index: pd.IntervalIndex, ts_format="%d.%m.%Y %H:%M",
+                            merged: bool = False) -> TimeLine:
+        """Creates a timeline from an IntervalIndex of timestamps.
+        Whether the intervals are open or closed is ignored."""
+        return cls.from_arrays(index.left, index.right, ts_format, merged)
+
+    @classmethod
+    def from_csv(cls, path: str, start_col: str = "start", end_col: str = "end",
+                 ts_format="%d.%m.%Y %H:%M", chunksize: int = 10**6,
+                 spill_dir: Optional[str] = None, **read_csv_kwargs) -> TimeLine:
+        """Creates a merged timeline from the start and end columns of a csv file.
+
+        The file is read chunk by chunk. Each chunk is merged and spilled to
+        disk as a sorted run, the runs are then k-way merged. Memory for
+        the input therefore depends on chunksize rather than on the file
+        size, while the merged timeline grows with its number of timeranges.
+        """
+        from src.ingest import iter_csv_chunks, merge_chunks
+        chunks = iter_csv_chunks(path, start_col, end_col, chunksize, **read_csv_kwargs)
+        return merge_chunks(chunks, start_col, end_col, ts_format, spill_dir=spill_dir)
+
+    @classmethod
+    def from_parquet(cls, path: str, start_col: str = "start", end_col: str = "end",
+                     ts_format="%d.%m.%Y %H:%M", chunksize: int = 10**6,
+                     spill_dir: Optional[str] = None) -> TimeLine:
+        """Creates a merged timeline from the start and end columns of a
+        parquet file, read batch by batch like in from_csv. Requires pyarrow."""
+        from src.ingest import iter_parquet_chunks, merge_chunks
+        chunks = iter_parquet_chunks(path, start_col, end_col, chunksize)
+        return merge_chunks(chunks, start_col, end_col, ts_format, spill_dir=spill_dir)
+
+    def to_frame(self, start_col: str = "start", end_col: str = "end") -> pd.DataFrame:
+        """Returns the timeranges as a DataFrame with a start and an end column."""
+        import pandas as pd
+        starts, ends = self._arrays()
+        return pd.DataFrame({start_col: starts.view("datetime64[ns]"),
+                             end_col: ends.view("datetime64[ns]")})
+
+    def to_interval_index(self, closed: str = "both") -> pd.IntervalIndex:
+        """Returns the timeranges as an IntervalIndex, closed on both sides by default
+        like TimeRange."""
+        import pandas as pd
+        starts, ends = self._arrays()
+        return pd.IntervalIndex.from_arrays(starts.view("datetime64[ns]"),
+                                            ends.view("datetime64[ns]"), closed=closed)
+
+    def __getstate__(self) -> dict:
+        # locks cannot be pickled, the cache is rebuilt on demand
+        with self._lock:
+            state = self.__dict__.copy()
+        del state["_lock"], state["_cache"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        self._cache = {}
+
+    def save(self, path: str) -> None:
+        """Saves the timeline to a compact binary file, see load."""
+        ts_format = self.ts_format.encode("utf-8")
+        starts, ends, merged, _ = self.snapshot()
+        header = _HEADER.pack(_MAGIC, _VERSION, merged, len(starts), len(ts_format)) + ts_format
+        padding = -len(header) % _ALIGNMENT
+        with open(path, "wb") as file:
+            file.write(header + b"\0" * padding)
+            starts.astype("<i8").tofile(file)
+            ends.astype("<i8").tofile(file)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> TimeLine:
+        """Loads a timeline saved with save.
+
+        Parameters
+        ----------
+        path : str
+            path of the file
+        mmap : bool, optional
+            whether to memory-map the file read-only instead of reading it,
+            by default True. Processes mapping the same file share its pages,
+            and operations which do not modify the timeline, e.g split or
+            intersection, run on the mapped buffer without copying it.
+
+        Raises
+        ------
+        ValueError
+            raised when the file is not a timeline file of a supported version.
+        """
+        with open(path, "rb") as file:
+            magic, version, merged, n, format_len = _HEADER.unpack(file.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not a timeline file.")
+            if version != _VERSION:
+                raise ValueError(f"unsupported timeline file version {version}.")
+            ts_format = file.read(format_len).decode("utf-8")
+        offset = _HEADER.size + format_len
+        offset += -offset % _ALIGNMENT
+        if mmap and n > 0:
+            arrays = np.memmap(path, dtype="<i8", mode="r", offset=offset, shape=(2, n))
+        else:
+            arrays = np.fromfile(path, dtype="<i8", count=2 * n, offset=offset).reshape(2, n)
+        return cls._from_ns(arrays[0], arrays[1], ts_format, bool(merged))
+
+    def _set_arrays(self, starts: np.ndarray, ends: np.ndarray, merged: bool) -> None:
+        """Replaces the start/end arrays of the timeline. They are stored as
+        read-only views, as other timelines and snapshots may share them."""
+        self._starts = np.asarray(starts, dtype=np.int64).view()
+        self._ends = np.asarray(ends, dtype=np.int64).view()
+        self._starts.flags.writeable = self._ends.flags.writeable = False
+        self._merged = merged
+        self._cache = {}
+
+    def _arrays(self) -> Tuple[np.ndarray]:
+        """Merged start and end arrays of a single version of the timeline,
+        which other threads cannot swap between reading the two."""
+        with self._lock:
+            self.merge()
+            return self._starts, self._ends
+
+    def _set_timeranges(self, timeranges: List[TimeRange | Tuple[str]], merged: bool) -> None:
+        if timeranges and all(isinstance(elem, (list, tuple)) and len(elem) == 2
+                              for elem in timeranges):
+            starts, ends = zip(*timeranges)
+            timeline = self.from_arrays(starts, ends, self.ts_format, merged)
+            self._set_arrays(timeline._starts, timeline._ends, timeline._merged)
+            return
+        timeranges = [TimeRange(*elem, format=self.ts_format) if isinstance(
+            elem, (list, tuple)) else elem for elem in timeranges]
+        timeranges = [timerange for timerange in timeranges if timerange.is_set()]
+        starts = [timerange.start_ns for timerange in timeranges]
+        ends = [timerange.end_ns for timerange in timeranges]
+        self._set_arrays(np.array(starts, dtype=np.int64),
+                         np.array(ends, dtype=np.int64), merged)
+
+    def _timerange(self, start: int, end: int) -> TimeRange:
+        return TimeRange._from_ns(start, end, self.ts_format)
+
+    @property
+    def timeranges(self) -> List[TimeRange]:
+        """List of the TimeRange objects composing the timeline."""
+        return [self._timerange(start, end) for start, end in zip(*self._arrays())]
+
+    @timeranges.setter
+    def timeranges(self, timeranges: List[TimeRange | Tuple[str]] | TimeLine) -> None:
+        if isinstance(timeranges, TimeLine):
+            timeranges = timeranges.branch()
+        with self._lock:
+            if isinstance(timeranges, TimeLine):
+                self._set_arrays(timeranges._starts,
+                                 timeranges._ends, timeranges._merged)
+            else:
+                self._set_timeranges(timeranges, merged=False)
+            self.merge()
+
     def __eq__(self, other: TimeRange) -> bool:
         if isinstance(other, list):
             return self.timeranges == other
-        return self.timeranges == other.timeranges
+        (starts, ends), (other_starts, other_ends) = self._arrays(), other._arrays()
+        return np.array_equal(starts, other_starts) and np.array_equal(ends, other_ends)
 
     def __repr__(self) -> str:
         if self.is_valid:
             return pformat(self.timeranges, width=10)
         return self.NOT_A_TIMELINE
 
-    def __getitem__(self, i: int) -> TimeRange:
-        return self.timeranges[i]
+    def __getitem__(self, i: int | slice) -> TimeRange | List[TimeRange]:
+        starts, ends = self._arrays()
+        if isinstance(i, slice):
+            return [self._timerange(start, end) for start, end in zip(starts[i], ends[i])]
+        return self._timerange(starts[i], ends[i])
+
+    def __iter__(self):
+        for start, end in zip(*self._arrays()):
+            yield self._timerange(start, end)
 
     def __add__(self, other: TimeLine) -> TimeLine:
         """Merge two timelines."""
-        return TimeLine(self.timeranges + other.timeranges, self.ts_format)
+        (starts, ends), (other_starts, other_ends) = self._arrays(), other._arrays()
+        return TimeLine._from_ns(np.concatenate((starts, other_starts)),
+                                 np.concatenate((ends, other_ends)),
+                                 self.ts_format)
 
     def __len__(self) -> int:
-        return len(self.timeranges)
+        return len(self._starts)
 
     @property
     def is_valid(self) -> bool:
@@ -80,57 +442,328 @@ class TimeLine:
 
     @property
     def start_time(self):
-        if not self.is_valid:
-            return None
-        self.merge()
-        return self[0].start_datetime
+        starts, _ = self._arrays()
+        return to_timestamp(starts[0]) if len(starts) else None
 
     @property
     def end_time(self):
-        if not self.is_valid:
-            return None
-        self.merge()
-        return self[-1].end_datetime
+        _, ends = self._arrays()
+        return to_timestamp(ends[-1]) if len(ends) else None
 
     @property
     def timedelta(self) -> pd.Timedelta:
-        if not self.is_valid:
-            return pd.Timedelta(value=0)
-        return np.sum([timerange.timedelta for timerange in self])
+        return to_timedelta(self._prefix_sums[-1])
 
+    @property
+    def fingerprint(self) -> str:
+        """Content hash of the merged timeline, equal for timelines with equal
+        timeranges, also across processes.
+
+        It is the sum of a 128-bit hash of each timerange, computed in O(n)
+        on first use. insert, remove, release, reserve_slot and consume then
+        update it from the timeranges they remove and add, e.g in O(1) per
+        reservation, instead of hashing the whole timeline again."""
+        return "{:016x}{:016x}".format(*self._cached("fingerprint", self._compute_fingerprint,
+                                                     tuple.__eq__))
+
+    def _compute_fingerprint(self) -> Tuple[int]:
+        self.merge()
+        return _range_hash_sums(self._starts, self._ends)
+
+    def _set_edited_arrays(self, starts: np.ndarray, ends: np.ndarray,
+                           removed: Tuple[np.ndarray], added: Tuple[np.ndarray]) -> None:
+        """Replaces the merged arrays after an edit which removed and added the
+        given timeranges, updating the cached fingerprint instead of dropping it."""
+        fingerprint = self._cache.get("fingerprint")
+        self._set_arrays(starts, ends, merged=True)
+        if fingerprint is not None:
+            self._cache["fingerprint"] = tuple(
+                (lane - removed_lane + added_lane) & _MASK for lane, removed_lane, added_lane
+                in zip(fingerprint, _range_hash_sums(*removed), _range_hash_sums(*added)))
+
+    def _set_remaining(self, remaining: TimeLine) -> None:
+        """Replaces the timeline by the part remaining after consuming from its
+        start, i.e its last len(remaining) timeranges, the first one possibly
+        shortened."""
+        cut = min(len(self), len(self) - len(remaining) + 1)
+        self._set_edited_arrays(remaining._starts, remaining._ends,
+                                (self._starts[:cut], self._ends[:cut]),
+                                (remaining._starts[:1], remaining._ends[:1]))
+
+    def _memoized(self, key: tuple, compute, operands: Tuple[TimeLine] = ()) -> Tuple[TimeLine]:
+        """Looks up the timelines computed for key and the fingerprints of self and
+        operands in TimeLine.memo, or computes and caches them. Cached arrays are
+        read-only, so hits share them."""
+        memo = TimeLine.memo
+        if memo is None:
+            return compute()
+        key += (self.ts_format, self.fingerprint, *(operand.fingerprint for operand in operands))
+        result = memo.get(key)
+        if result is None:
+            timelines = compute()
+            memo.put(key, tuple((timeline._starts, timeline._ends) for timeline in timelines))
+            return timelines
+        return tuple(TimeLine._from_ns(starts, ends, self.ts_format, merged=True)
+                     for starts, ends in result)
+
+    @property
+    def largest_gap(self) -> pd.Timedelta:
+        """Longest time between two consecutive timeranges, 0 for less than two timeranges."""
+        return to_timedelta(self._cached("largest_gap", self._compute_largest_gap))
+
+    def _compute_largest_gap(self) -> int:
+        self.merge()
+        return int(np.max(self._starts[1:] - self._ends[:-1], initial=0))
+
+    def _cached(self, key: str, compute, equal=np.array_equal):
+        """Returns an aggregate computed from the arrays, cached until they are
+        replaced. If validate_cache is set, the cached value is checked against
+        a full recompute."""
+        with self._lock:
+            cache = self._cache
+            if key not in cache:
+                value = compute()
+                # replacing the arrays replaces the cache, so a value computed
+                # while they are replaced, e.g merged, is not stored
+                if self._cache is cache:
+                    cache[key] = value
+                return value
+            if self.validate_cache and not equal(cache[key], compute()):
+                raise AssertionError(f"cached {key} of timeline is stale.")
+            return cache[key]
+
+    @property
+    def _prefix_sums(self) -> np.ndarray:
+        """Available time before each timerange followed by the total available time,
+        cached until the timeline changes."""
+        return self._cached("prefix_sums", self._compute_prefix_sums)
+
+    def _compute_prefix_sums(self) -> np.ndarray:
+        self.merge()
+        return np.concatenate(([0], np.cumsum(self._ends - self._starts)))
+
+    def _position_ns(self, timestamps: np.ndarray) -> np.ndarray:
+        """Available time between the start of the timeline and each timestamp."""
+        with self._lock:
+            if not self.is_valid:
+                return np.zeros_like(timestamps)
+            prefix_sums = self._prefix_sums
+            # self[i], i.e last TimeRange starting before the timestamp
+            i = self._index_at(timestamps)
+            j = np.maximum(i, 0)
+            within = np.minimum(timestamps, self._ends[j]) - self._starts[j]
+            return np.where(i >= 0, prefix_sums[j] + within, 0)
+
+    def _datetime_at_ns(self, positions: np.ndarray) -> np.ndarray:
+        """Datetimes at which the available time since the start of the timeline
+        reaches each position. Positions must not exceed the available time."""
+        with self._lock:
+            cumsum = self._prefix_sums[1:]
+            # self[i], i.e TimeRange at which the position is reached
+            i = np.searchsorted(cumsum, positions, side="left")
+            return self._ends[i] - (cumsum[i] - positions)
+
+    def position_of(self, timestamp: pd.Timestamp) -> pd.Timedelta:
+        """Returns available time between the start of the timeline and timestamp."""
+        return to_timedelta(self._position_ns(to_ns(timestamp)))
+
+    def available_between(self, start: pd.Timestamp, end: pd.Timestamp) -> pd.Timedelta:
+        """Returns available time between two timestamps."""
+        if to_ns(start) > to_ns(end):
+            raise ValueError(
+                "time inversion found: {:s} > {:s}".format(str(start), str(end)))
+        with self._lock:
+            return self.position_of(end) - self.position_of(start)
+
+    def finish_time(self, start: pd.Timestamp, timedelta: pd.Timedelta) -> pd.Timestamp:
+        """Returns the datetime at which consuming timedelta starting at start finishes,
+        without modifying or copying the timeline.
+
+        Raises
+        ------
+        UnsuficientTimedeltaError
+            raised when time to consume is greater than time available after start.
+        """
+        start, timedelta_ns = to_ns(start), to_ns_delta(timedelta)
+        with self._lock:
+            position = self._position_ns(start) + timedelta_ns
+            if position > self._prefix_sums[-1]:
+                available = to_timedelta(self._prefix_sums[-1] - self._position_ns(start))
+                raise UnsuficientTimedeltaError(available, timedelta)
+            if timedelta_ns == 0:
+                return to_timestamp(start)
+            return to_timestamp(self._datetime_at_ns(position))
+
+    @instrumented
     def merge(self) -> None:
         """simplifies timeline by merging timeranges which either overlap
         or are adjacent."""
         if self._merged or len(self) <= 1:
             return
-        timeranges = list(filter(lambda x: x.is_set(), self.timeranges))
-        timeranges.sort(key=lambda x: x.start_datetime, reverse=False)
-        merged = [timeranges[0].copy()]
-        for i in range(1, len(timeranges)):
-            x = merged[-1]
-            y = timeranges[i].copy()
-            if x.is_intersection(y):
-                merged[-1] = x.encompass(y)
-            else:
-                merged.append(y)
-        self.timeranges = merged
-        self._merged = True
+        with self._lock:
+            if not self._merged:
+                self._set_arrays(*_merge_arrays(self._starts, self._ends), merged=True)
+
+    def _to_ns_pair(self, timerange: TimeRange | Tuple[str]) -> Optional[Tuple[int]]:
+        if isinstance(timerange, (list, tuple)):
+            timerange = TimeRange(*timerange, format=self.ts_format)
+        if not timerange.is_set():
+            return None
+        return timerange.start_ns, timerange.end_ns
 
+    def _splice(self, lo: int, hi: int, starts: List[int], ends: List[int]) -> None:
+        """Replaces the timeranges lo:hi by the given timeranges. Copies both
+        arrays, i.e takes O(n), and drops the cached aggregates except the
+        fingerprint."""
+        starts, ends = np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+        self._set_edited_arrays(np.concatenate((self._starts[:lo], starts, self._starts[hi:])),
+                                np.concatenate((self._ends[:lo], ends, self._ends[hi:])),
+                                (self._starts[lo:hi], self._ends[lo:hi]), (starts, ends))
+
+    def insert(self, timerange: TimeRange | Tuple[str]) -> None:
+        """Adds a timerange to the timeline, merging it only with the timeranges
+        it overlaps or touches, which are found by bisection in O(log n).
+
+        Splicing the result in copies the arrays, so an insert takes O(n), about
+        1.5 ms for 10^6 timeranges, and the cached aggregates are recomputed on
+        next use. Add many timeranges at once with union_all instead.
+        """
+        pair = self._to_ns_pair(timerange)
+        if pair is None:
+            return
+        start, end = pair
+        with self._lock:
+            self.merge()
+            # timeranges lo:hi overlap or are adjacent to the inserted timerange
+            lo = int(np.searchsorted(self._ends, start, side="left"))
+            hi = int(np.searchsorted(self._starts, end, side="right"))
+            if lo < hi:
+                start, end = min(start, self._starts[lo]), max(end, self._ends[hi - 1])
+            self._splice(lo, hi, [start], [end])
+
+    def remove(self, timerange: TimeRange | Tuple[str]) -> None:
+        """Removes a timerange from the timeline, only cutting the timeranges
+        it overlaps, which are found by bisection in O(log n).
+
+        Like difference, zero-length timeranges are kept, also within the
+        removed timerange, and a zero-length timerange removes nothing.
+        Like insert, splicing the result in takes O(n). Remove many timeranges
+        at once with difference instead.
+        """
+        pair = self._to_ns_pair(timerange)
+        if pair is None or pair[0] >= pair[1]:
+            return
+        start, end = pair
+        with self._lock:
+            self.merge()
+            # timeranges lo:hi overlap with the removed timerange
+            lo = int(np.searchsorted(self._ends, start, side="right"))
+            hi = int(np.searchsorted(self._starts, end, side="left"))
+            if lo >= hi:
+                return
+            # zero-length timeranges lie strictly within the removed timerange
+            within = self._starts[lo:hi] == self._ends[lo:hi]
+            starts, ends = [self._starts[lo:hi][within]], [self._ends[lo:hi][within]]
+            if self._starts[lo] < start:
+                starts.insert(0, [self._starts[lo]])
+                ends.insert(0, [start])
+            if self._ends[hi - 1] > end:
+                starts.append([end])
+                ends.append([self._ends[hi - 1]])
+            self._splice(lo, hi, np.concatenate(starts), np.concatenate(ends))
+
+    @instrumented
     def inter_diff(self, other: TimeLine) -> Tuple[TimeLine]:
-        """Calculates intersection and difference of a timeline with another."""
+        """Calculates intersection and difference of a timeline with another.
+
+        Like TimeRange.intersection and TimeRange.differences, timeranges which
+        only touch intersect in a zero-length timerange, which does not cut
+        them in the difference.
+        """
         assert isinstance(other, TimeLine)
+        # a private branch of other cannot change while self is locked
+        other = other.branch()
+        with self._lock:
+            return self._memoized(("inter_diff",), lambda: self._inter_diff(other), (other,))
+
+    def _inter_diff(self, other: TimeLine) -> Tuple[TimeLine]:
         self.merge()
         other.merge()
-        inter = []
-        diff = []
         if len(other) == 0:
-            return TimeLine(), TimeLine(self.timeranges, merged=True)
-        for src_tr in self:
-            for subt_tr in other:
-                if src_tr.is_intersection(subt_tr):
-                    inter.append(src_tr.intersection(subt_tr))
-            diff.extend(src_tr.differences(other.timeranges))
-        return TimeLine(inter, merged=True), TimeLine(diff, merged=True)
+            return (TimeLine(ts_format=self.ts_format),
+                    TimeLine._from_ns(self._starts, self._ends, self.ts_format, merged=True))
+        arrays = (self._starts, self._ends, other._starts, other._ends)
+        return (TimeLine._from_ns(*_intersect_arrays(*arrays), self.ts_format, merged=True),
+                TimeLine._from_ns(*_subtract_arrays(*arrays), self.ts_format, merged=True))
+
+    @staticmethod
+    def union_all(timelines: List[TimeLine]) -> TimeLine:
+        """Merges many timelines into one.
+
+        The start arrays form one sorted run per timeline, so the stable
+        sort in merge only has to merge k runs, i.e takes O(N log k).
+        """
+        if not timelines:
+            return TimeLine()
+        starts, ends = zip(*(timeline._arrays() for timeline in timelines))
+        return TimeLine._from_ns(np.concatenate(starts), np.concatenate(ends),
+                                 timelines[0].ts_format)
+
+    @staticmethod
+    def intersect_all(timelines: List[TimeLine]) -> TimeLine:
+        """Calculates the intersection of many timelines, e.g machine, operator and tooling,
+        equal to intersecting them one after another."""
+        if not timelines:
+            raise ValueError("intersection of no timelines is undefined.")
+        return TimeLine.coverage(timelines, min_count=len(timelines))
+
+    @staticmethod
+    def coverage(timelines: List[TimeLine], min_count: int = 1,
+                 profile: bool = False) -> TimeLine | Tuple[np.ndarray]:
+        """Calculates when at least min_count of the timelines are available,
+        e.g when at least q of 12 identical machines are free.
+
+        All boundaries are swept once. The starts and the ends of each timeline
+        form a sorted run, so sorting them takes O(N log k) for k timelines.
+        Timeranges are closed like TimeRange, so timelines which only touch
+        are both available at that instant.
+
+        Parameters
+        ----------
+        timelines : List[TimeLine]
+            timelines of the resources
+        min_count : int, optional
+            number of resources that must be available, by default 1
+        profile : bool, optional
+            whether to return the number of available resources over time
+            instead of a timeline, by default False
+
+        Returns
+        -------
+        TimeLine | Tuple[np.ndarray]
+            timeline when at least min_count resources are available, or the
+            step function as datetime64[ns] boundaries and the number of
+            available resources from each boundary on.
+        """
+        ts_format = timelines[0].ts_format if timelines else "%d.%m.%Y %H:%M"
+        empty = (np.empty(0, dtype=np.int64),) * 2
+        starts, ends = zip(empty, *(timeline._arrays() for timeline in timelines))
+        starts, ends = np.concatenate(starts), np.concatenate(ends)
+        times = np.concatenate((starts, ends))
+        deltas = np.repeat(np.array([1, -1], dtype=np.int64), len(starts))
+        # the stable sort puts starts before ends at equal datetimes, so the
+        # count between them is the number of timelines available at that instant
+        order = np.argsort(times, kind="stable")
+        times, counts = times[order], np.cumsum(deltas[order])
+        if profile:
+            # count after the last boundary at each distinct datetime
+            last = np.flatnonzero(np.append(np.diff(times) != 0, True)) if len(times) else []
+            return times[last].view("datetime64[ns]"), counts[last]
+        # elementary segments between consecutive boundaries, zero-length at ties
+        seg_starts, seg_ends = times[:-1], times[1:]
+        covered = counts[:-1] >= min_count
+        return TimeLine._from_ns(*_coalesce_arrays(seg_starts[covered], seg_ends[covered]),
+                                 ts_format, merged=True)
 
     def intersection(self, other: TimeLine) -> TimeLine:
         """Calculate intersection of a timeline with another."""
@@ -143,76 +776,425 @@ class TimeLine:
     @property
     def has_overlaps(self) -> bool:
         """Tests whether timeline has overlapping TimeRanges"""
-        timeranges = list(filter(lambda x: x.is_set(), self.timeranges))
-        if len(timeranges) == 0:
+        with self._lock:
+            starts, ends = self._starts, self._ends
+        if len(starts) == 0:
             return False
-        timeranges.sort(key=lambda x: x.start_datetime, reverse=False)
-        for i in range(len(timeranges)-1):
-            current, successor = timeranges[i], timeranges[i+1]
-            if current.intersection(successor).timedelta > pd.Timedelta(value=0):
-                return True
-        return False
+        order = np.argsort(starts, kind="mergesort")
+        starts, ends = starts[order], ends[order]
+        return bool(np.any(np.minimum(ends[:-1], ends[1:]) > starts[1:]))
+
+    def __contains__(self, item: pd.Timestamp | TimeRange) -> bool:
+        """Tests whether a timestamp or a whole TimeRange lies within one of the timeranges."""
+        if isinstance(item, TimeRange):
+            if not item.is_set():
+                return False
+            start, end = item.start_ns, item.end_ns
+        else:
+            start = end = to_ns(item)
+        with self._lock:
+            i = self._index_at(start)
+            return bool(i >= 0 and end <= self._ends[i])
+
+    def _index_at(self, timestamps: int | np.ndarray) -> int | np.ndarray:
+        """Index of the last TimeRange starting at or before each timestamp, or -1."""
+        self.merge()
+        return np.searchsorted(self._starts, timestamps, side="right") - 1
 
+    def range_at(self, timestamp: pd.Timestamp) -> Optional[TimeRange]:
+        """Returns the TimeRange containing timestamp, or None if it lies in a gap."""
+        timestamp = to_ns(timestamp)
+        with self._lock:
+            i = self._index_at(timestamp)
+            if i < 0 or timestamp > self._ends[i]:
+                return None
+            return self._timerange(self._starts[i], self._ends[i])
+
+    @instrumented
     def split(self, separator: pd.Timestamp) -> Tuple[TimeLine]:
         """Split timeline into two timelines according to separator."""
-        # Case 1: seperator before timeline
-        if separator < self[0].start_datetime:
-            return TimeLine(), TimeLine(self[:], merged=True)
-        # Case 2: separator after timeline
-        if separator > self[-1].end_datetime:
-            return TimeLine(self[:], merged=True), TimeLine()
-        # Case 3: separator within timeline but not in any DTR
-        bool_arr = [separator in x for x in self]
-        if not any(bool_arr):
-            end_datetimes = np.array(
-                [dtr.end_datetime for dtr in self])
-            i = np.nonzero(separator < end_datetimes)[0][0]
-            return TimeLine(self[:i], merged=True), TimeLine(self[i:], merged=True)
-        # Case 4: separator within timeline and in a DTR
-        i = bool_arr.index(True)
-        x_left = TimeRange(self[i].start_datetime, separator, self[i].format)
-        x_right = TimeRange(separator, self[i].end_datetime, self[i].format)
-        if x_left.timedelta > pd.Timedelta(value=0):
-            dtrs_left = self[:i] + [x_left]
-        else:
-            dtrs_left = self[:i]
-        if x_right.timedelta > pd.Timedelta(value=0):
-            dtrs_right = [x_right] + self[i+1:]
-        else:
-            dtrs_right = self[i+1:]
-        return TimeLine(dtrs_left, merged=True), TimeLine(dtrs_right, merged=True)
+        separator = to_ns(separator)
+        with self._lock:
+            return self._memoized(("split", separator), lambda: (
+                self._between(_MIN, separator), self._between(separator, _MAX)))
+
+    def _between(self, left: int, right: int) -> TimeLine:
+        """Returns the part of the timeline between two datetimes (in nanoseconds since epoch)."""
+        starts, ends = self._arrays()
+        lo = int(np.searchsorted(ends, left, side="right"))
+        hi = int(np.searchsorted(starts, right, side="left"))
+        return self._piece(starts, ends, lo, hi, left, right)
+
+    def _piece(self, starts: np.ndarray, ends: np.ndarray, lo: int, hi: int,
+               left: int, right: int) -> TimeLine:
+        """Returns the timeranges lo:hi of the arrays clipped to [left, right]."""
+        if hi <= lo or left == right:
+            return TimeLine(ts_format=self.ts_format)
+        starts, ends = starts[lo:hi], ends[lo:hi]
+        if starts[0] < left:
+            starts = starts.copy()
+            starts[0] = left
+        if ends[-1] > right:
+            ends = ends.copy()
+            ends[-1] = right
+        return TimeLine._from_ns(starts, ends, self.ts_format, merged=True)
+
+    def _cut(self, separators: np.ndarray) -> List[TimeLine]:
+        """Cuts the timeline at sorted separators (in nanoseconds since epoch)
+        and returns the len(separators) + 1 pieces in a single pass."""
+        starts, ends = self._arrays()
+        lefts = np.concatenate(([_MIN], separators))
+        rights = np.concatenate((separators, [_MAX]))
+        # piece j consists of the timeranges los[j]:his[j], clipped to [lefts[j], rights[j]]
+        los = np.searchsorted(ends, lefts, side="right")
+        his = np.searchsorted(starts, rights, side="left")
+        return [self._piece(starts, ends, lo, hi, left, right)
+                for lo, hi, left, right in zip(los, his, lefts, rights)]
+
+    def split_at(self, separators: List[pd.Timestamp]) -> List[TimeLine]:
+        """Split timeline at several sorted separators in a single pass.
+
+        Returns
+        -------
+        List[TimeLine]
+            len(separators) + 1 timelines, i.e the timeline before the first
+            separator, between each pair of consecutive separators and after
+            the last separator.
+        """
+        return self._cut(_sorted_ns_array(separators))
+
+    def availability_per_bin(self, bin_edges: List[pd.Timestamp]) -> np.ndarray:
+        """Returns available time within each bin, e.g per shift or per day,
+        without splitting the timeline.
+
+        Parameters
+        ----------
+        bin_edges : List[pd.Timestamp]
+            sorted edges, bin i lies between bin_edges[i] and bin_edges[i+1]
+
+        Returns
+        -------
+        np.ndarray
+            timedelta64[ns] array with len(bin_edges) - 1 available times.
+        """
+        positions = self._position_ns(_sorted_ns_array(bin_edges))
+        return np.diff(positions).view("timedelta64[ns]")
+
+    def cumulative_at(self, timestamps: List[pd.Timestamp]) -> np.ndarray:
+        """Returns the available time between the start of the timeline and each
+        timestamp, i.e the cumulative availability curve sampled at the timestamps.
+
+        Parameters
+        ----------
+        timestamps : List[pd.Timestamp]
+            sample timestamps, in any order
+
+        Returns
+        -------
+        np.ndarray
+            timedelta64[ns] array with one available time per timestamp.
+        """
+        timestamps = to_ns_array(timestamps)
+        if np.any(timestamps == _NAT):
+            raise ValueError("timestamps must not be missing.")
+        return self._position_ns(timestamps).view("timedelta64[ns]")
+
+    def rolling_availability(self, window: pd.Timedelta, step: pd.Timedelta,
+                             start: Optional[pd.Timestamp] = None,
+                             end: Optional[pd.Timestamp] = None) -> Tuple[np.ndarray]:
+        """Returns the available time within windows of fixed length, e.g the
+        available hours in each 24 h window starting every minute.
+
+        Parameters
+        ----------
+        window : pd.Timedelta
+            length of the windows
+        step : pd.Timedelta
+            time between the starts of consecutive windows
+        start : pd.Timestamp, optional
+            start of the first window, by default the start of the timeline
+        end : pd.Timestamp, optional
+            no window ends after end, by default the end of the timeline
+
+        Returns
+        -------
+        Tuple[np.ndarray]
+            datetime64[ns] starts of the windows and timedelta64[ns] available
+            time within each window.
+        """
+        window, step = to_ns_delta(window), to_ns_delta(step)
+        if window <= 0 or step <= 0:
+            raise ValueError("window and step must be positive.")
+        with self._lock:
+            if not self.is_valid and (start is None or end is None):
+                starts = np.empty(0, dtype=np.int64)
+            else:
+                start = self._starts[0] if start is None else to_ns(start)
+                end = self._ends[-1] if end is None else to_ns(end)
+                starts = np.arange(start, end - window + 1, step, dtype=np.int64)
+            available = self._position_ns(starts + window) - self._position_ns(starts)
+        return starts.view("datetime64[ns]"), available.view("timedelta64[ns]")
 
     def left_split(self, separator: pd.Timestamp) -> TimeLine:
         """Returns timeline left of the seperator."""
-        return self.split(separator)[0]
+        return self._between(_MIN, to_ns(separator))
 
     def right_split(self, separator: pd.Timestamp) -> TimeLine:
         """Returns timeline right of the seperator."""
-        return self.split(separator)[1]
+        return self._between(to_ns(separator), _MAX)
 
+    @instrumented
     def copy(self) -> TimeLine:
         """Copy timeline"""
-        return TimeLine([timerange.copy() for timerange in self.timeranges], merged=self._merged)
+        starts, ends, merged, _ = self.snapshot()
+        return TimeLine._from_ns(starts.copy(), ends.copy(), self.ts_format, merged=merged)
+
+    def branch(self) -> TimeLine:
+        """Returns a copy of the timeline in O(1), sharing its arrays and cached
+        prefix sums. Changing either timeline replaces its own arrays only."""
+        with self._lock:
+            timeline = TimeLine._from_ns(self._starts, self._ends, self.ts_format, merged=self._merged)
+            timeline._cache = self._shareable_cache()
+        return timeline
+
+    def snapshot(self) -> TimeLineSnapshot:
+        """Captures the current state of the timeline in O(1), see rollback.
+
+        Examples
+        --------
+        >>> snapshot = timeline.snapshot()
+        >>> timeline.consume(pd.Timedelta("2 hours"))
+        >>> timeline.rollback(snapshot)
+        """
+        with self._lock:
+            return TimeLineSnapshot(self._starts, self._ends, self._merged, self._shareable_cache())
+
+    def rollback(self, snapshot: TimeLineSnapshot) -> None:
+        """Restores the state captured by snapshot in O(1)."""
+        with self._lock:
+            self._set_arrays(snapshot.starts, snapshot.ends, snapshot.merged)
+            self._cache = dict(snapshot.cache)
 
+    def _shareable_cache(self) -> dict:
+        # the slot tree is updated in place by reserve_slot, so it is not shared
+        return {key: value for key, value in self._cache.items() if key != "slot_tree"}
+
+    @instrumented
     def consume(self, timedelta: pd.Timedelta, update: bool = True) -> TimeLine | Tuple[TimeLine]:
         """Consumes a certain amount of time from timeline."""
-        for timerange in self:
-            assert isinstance(timerange, TimeRange)
-        # find self[i], i.e TimeRange at which the workstep finishes
-        cumsum = np.cumsum([timerange.timedelta for timerange in self])
-        if timedelta > self.timedelta:
-            raise UnsuficientTimedeltaError(self.timedelta, timedelta)
-        diffs = cumsum - timedelta
-        i = np.nonzero(diffs >= pd.Timedelta(value=0))[0][0]
-        remaining_timedelta = diffs[i]
-        # calcualte split datetime
-        split_datetime = self[i].end_datetime - remaining_timedelta
-        # split opr_dtrs into two sub dtrs: consumed and remaining
-        consumed, remaining = self.split(split_datetime)
-        if not update:
-            return consumed, remaining
-        self.timeranges = remaining
-        return consumed
+        timedelta_ns = to_ns_delta(timedelta)
+        with self._lock:
+            if timedelta_ns > self._prefix_sums[-1]:
+                raise UnsuficientTimedeltaError(self.timedelta, timedelta)
+            if not update:
+                return self._memoized(("consume", timedelta_ns),
+                                      lambda: self._consume_split(timedelta_ns))
+            consumed, remaining = self._consume_split(timedelta_ns)
+            self._set_remaining(remaining)
+            return consumed
+
+    def _consume_split(self, timedelta_ns: int) -> Tuple[TimeLine]:
+        """Splits the timeline into the consumed and the remaining timeline."""
+        if not self.is_valid:
+            return TimeLine(ts_format=self.ts_format), TimeLine(ts_format=self.ts_format)
+        separator = self._datetime_at_ns(timedelta_ns)
+        return self._between(_MIN, separator), self._between(separator, _MAX)
+
+    def consume_many(self, timedeltas: List[pd.Timedelta],
+                     update: bool = True) -> List[TimeLine] | Tuple[List[TimeLine], TimeLine]:
+        """Consumes several amounts of time from timeline one after another.
+
+        All split datetimes are computed with a single cumulative sum and
+        searchsorted pass instead of one consume call per amount.
+
+        Parameters
+        ----------
+        timedeltas : List[pd.Timedelta]
+            amounts of time to consume in order, e.g. the worksteps of a routing
+        update : bool, optional
+            whether the timeline is replaced by the remaining timeline, by default True
+
+        Returns
+        -------
+        List[TimeLine] | Tuple[List[TimeLine], TimeLine]
+            consumed timeline of each amount, and the remaining timeline if update is False
+
+        Raises
+        ------
+        UnsuficientTimedeltaError
+            raised when the total time to consume is greater than available time.
+        """
+        demands = np.array([to_ns_delta(timedelta) for timedelta in timedeltas], dtype=np.int64)
+        if np.any(demands < 0):
+            raise ValueError("time to consume must not be negative.")
+        demands = np.cumsum(demands)
+        total = demands[-1] if len(demands) else 0
+        with self._lock:
+            if total > self._prefix_sums[-1]:
+                raise UnsuficientTimedeltaError(self.timedelta, to_timedelta(total))
+            if self.is_valid:
+                split_datetimes = self._datetime_at_ns(demands)
+            else:
+                # only zero amounts of time can be consumed from an empty timeline
+                split_datetimes = demands
+            *consumed, remaining = self._cut(split_datetimes)
+            if not update:
+                return consumed, remaining
+            self._set_remaining(remaining)
+            return consumed
+
+    @property
+    def _slot_tree(self) -> SlotTree:
+        """Segment tree over the timeranges, cached until the timeline changes
+        other than by reserve_slot."""
+        return self._cached("slot_tree", self._compute_slot_tree, self._is_valid_slot_tree)
+
+    def _compute_slot_tree(self) -> SlotTree:
+        self.merge()
+        return SlotTree(MaxSegmentTree(self._ends - self._starts), self._starts, self._ends)
+
+    def _is_valid_slot_tree(self, slot_tree: SlotTree, _) -> bool:
+        """Whether each leaf holds the longest timerange within its timerange."""
+        lo = np.searchsorted(self._starts, slot_tree.starts, side="left")
+        hi = np.searchsorted(self._ends, slot_tree.ends, side="right")
+        if np.sum(np.maximum(hi - lo, 0)) != len(self):
+            return False
+        lengths = self._ends - self._starts
+        longest = [lengths[i:j].max() if i < j else MaxSegmentTree.EMPTY for i, j in zip(lo, hi)]
+        return [slot_tree.tree[leaf] for leaf in range(len(slot_tree.tree))] == longest
+
+    def _within_leaf(self, slot_tree: SlotTree, leaf: int) -> Tuple[int, int]:
+        """Indices lo:hi of the timeranges within the timerange of a leaf."""
+        return (int(np.searchsorted(self._starts, slot_tree.starts[leaf], side="left")),
+                int(np.searchsorted(self._ends, slot_tree.ends[leaf], side="right")))
+
+    def _first_fitting(self, lo: int, hi: int, timedelta_ns: int) -> int:
+        """Index of the first of the timeranges lo:hi which fits timedelta, or -1."""
+        fits = np.flatnonzero(self._ends[lo:hi] - self._starts[lo:hi] >= timedelta_ns)
+        return lo + int(fits[0]) if len(fits) else -1
+
+    def _find_slot_ns(self, timedelta_ns: int, earliest_ns: int) -> int:
+        """Returns the index of the first TimeRange which fits timedelta after earliest, or -1."""
+        # self[i], i.e last TimeRange starting before or at earliest
+        i = int(self._index_at(earliest_ns))
+        if i >= 0 and self._ends[i] - max(self._starts[i], earliest_ns) >= timedelta_ns:
+            return i
+        if i + 1 >= len(self):
+            return -1
+        slot_tree = self._slot_tree
+        # the timeranges after i within the same leaf, then the first leaf which fits
+        leaf = int(np.searchsorted(slot_tree.starts, self._starts[i + 1], side="right")) - 1
+        j = self._first_fitting(i + 1, self._within_leaf(slot_tree, leaf)[1], timedelta_ns)
+        if j >= 0:
+            return j
+        leaf = slot_tree.tree.first_at_least(timedelta_ns, leaf + 1)
+        if leaf < 0:
+            return -1
+        return self._first_fitting(*self._within_leaf(slot_tree, leaf), timedelta_ns)
+
+    def find_slot(self, timedelta: pd.Timedelta, earliest: Optional[pd.Timestamp] = None) -> Optional[TimeRange]:
+        """Finds the earliest contiguous slot of length timedelta for non-preemptive work.
+
+        Parameters
+        ----------
+        timedelta : pd.Timedelta
+            length of the slot
+        earliest : pd.Timestamp, optional
+            release time, i.e the slot must not start before it, by default None
+
+        Returns
+        -------
+        Optional[TimeRange]
+            the slot, or None if no TimeRange is long enough.
+        """
+        timedelta_ns = to_ns_delta(timedelta)
+        earliest_ns = _MIN if earliest is None else to_ns(earliest)
+        # reserve_slot updates the slot tree in place
+        with self._lock:
+            i = self._find_slot_ns(timedelta_ns, earliest_ns)
+            if i < 0:
+                return None
+            start = max(self._starts[i], earliest_ns)
+        return self._timerange(start, start + timedelta_ns)
+
+    def reserve_slot(self, timedelta: pd.Timedelta, earliest: Optional[pd.Timestamp] = None) -> TimeRange:
+        """Finds the earliest contiguous slot of length timedelta like find_slot and
+        removes it from the timeline.
+
+        Raises
+        ------
+        UnsuficientTimedeltaError
+            raised when no TimeRange after earliest is long enough.
+        """
+        timedelta_ns = to_ns_delta(timedelta)
+        earliest_ns = _MIN if earliest is None else to_ns(earliest)
+        with self._lock:
+            slot_tree = self._slot_tree
+            i = self._find_slot_ns(timedelta_ns, earliest_ns)
+            if i < 0:
+                longest = np.max(self._ends - np.maximum(self._starts, earliest_ns), initial=0)
+                raise UnsuficientTimedeltaError(to_timedelta(longest), timedelta)
+            start = max(self._starts[i], earliest_ns)
+            end = start + timedelta_ns
+            if timedelta_ns == 0:
+                # a zero-length slot takes no time
+                return self._timerange(start, end)
+            leaf = int(np.searchsorted(slot_tree.starts, self._starts[i], side="right")) - 1
+            starts, ends = self._starts, self._ends
+            removed = starts[i:i + 1], ends[i:i + 1]
+            has_left, has_right = start > starts[i], ends[i] > end
+            if has_left and has_right:
+                starts, ends = np.insert(starts, i + 1, end), np.insert(ends, i, start)
+                added = starts[i:i + 2], ends[i:i + 2]
+            elif has_left:
+                ends = ends.copy()
+                ends[i] = start
+                added = starts[i:i + 1], ends[i:i + 1]
+            elif has_right:
+                starts = starts.copy()
+                starts[i] = end
+                added = starts[i:i + 1], ends[i:i + 1]
+            else:
+                starts, ends = np.delete(starts, i), np.delete(ends, i)
+                added = starts[:0], ends[:0]
+            self._set_edited_arrays(starts, ends, removed, added)
+            # only the leaf of the reserved timerange changes
+            lo, hi = self._within_leaf(slot_tree, leaf)
+            slot_tree.tree.update(leaf, np.max(ends[lo:hi] - starts[lo:hi], initial=MaxSegmentTree.EMPTY))
+            self._cache["slot_tree"] = slot_tree
+            return self._timerange(start, end)
+
+    def reserve(self, timedelta: pd.Timedelta, earliest: Optional[pd.Timestamp] = None) -> TimeRange:
+        """Reserves the earliest contiguous slot of length timedelta like reserve_slot.
+
+        Like every method modifying the timeline, reserve and release hold its
+        lock, so they can be called from many threads at once, also together
+        with e.g consume, and reservations never overlap.
+
+        Raises
+        ------
+        UnsuficientTimedeltaError
+            raised when no TimeRange after earliest is long enough.
+        """
+        return self.reserve_slot(timedelta, earliest)
+
+    def release(self, reservation: TimeRange) -> None:
+        """Gives a reservation back to the timeline.
+
+        Raises
+        ------
+        ValueError
+            raised when the reservation overlaps available time, i.e it was
+            released already or never reserved.
+        """
+        start, end = reservation.start_ns, reservation.end_ns
+        with self._lock:
+            self.merge()
+            # last timerange starting before the reservation ends
+            i = int(np.searchsorted(self._starts, end, side="left")) - 1
+            if i >= 0 and self._ends[i] > start:
+                raise ValueError(f"reservation {reservation} overlaps available time.")
+            self.insert(reservation)
 
     # def plot_timeline(self, y="None", title=None):
     #     "Plots timeline that can be visualized in jupyter notebook."
@@ -229,7 +1211,34 @@ class TimeLine:
     #     return fig
 
 
+class SlotTree(NamedTuple):
+    """Segment tree over the timeranges of a timeline when it was built.
+
+    reserve_slot only shortens, splits or removes timeranges, so each of
+    them stays within the timerange of one leaf. A leaf holds the longest
+    timerange within its timerange, or MaxSegmentTree.EMPTY if reservations
+    took all of it, so a reservation updates one leaf in O(k + log n) for
+    k timeranges within it instead of rebuilding the tree.
+    """
+    tree: MaxSegmentTree
+    starts: np.ndarray
+    ends: np.ndarray
+
+
+class TimeLineSnapshot(NamedTuple):
+    """State of a timeline captured by TimeLine.snapshot."""
+    starts: np.ndarray
+    ends: np.ndarray
+    merged: bool
+    cache: dict
+
+
 class UnsuficientTimedeltaError(ValueError):
     def __init__(self, av_timedelta, cons_timedelta: pd.Timedelta) -> None:
+        self.av_timedelta, self.cons_timedelta = av_timedelta, cons_timedelta
         self.message = f"available time {av_timedelta} is shorter than time to consume {cons_timedelta}."
         super().__init__(self.message)
+
+    def __reduce__(self):
+        # lets the error be raised across processes
+        return type(self), (self.av_timedelta, self.cons_timedelta)
@@ -8,62 +8,196 @@ Created on Sat Feb 27 11:46:25 2021
 """
 
 from __future__ import annotations
-from typing import List
-import pandas as pd
-from datetimerange import DateTimeRange
+from typing import TYPE_CHECKING, List, Optional
+from src.conversion import NAT, parse_ns, to_datetime, to_ns, to_timedelta, to_timestamp
+from src import profiling
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def _parse(value, format: str) -> Optional[int]:
+    """Converts a timestamp or a string in the given format to nanoseconds since epoch."""
+    if value is None:
+        return None
+    value = parse_ns(value, format) if isinstance(value, str) else to_ns(value)
+    return None if value == NAT else value
+
+
+class TimeRange:
+    """Immutable time range between two timestamps, stored as nanoseconds since epoch.
+
+    The API mirrors DateTimeRange. Start and end are inclusive. A TimeRange
+    without start or end is not set, e.g the intersection of two disjoint
+    TimeRanges. The format is only used to parse strings and to render the
+    TimeRange as a string.
+    """
+
+    __slots__ = ("_start", "_end", "format")
+
+    NOT_A_TIME_STR = "NaT"
 
-class TimeRange(DateTimeRange):
     def __init__(self, start: str, end: str, format: str = '%d.%m.%Y %H:%M'):
-        self.start = start
-        self.end = end
-        self.format = format
-        start_datetime = pd.to_datetime(start, format=format)
-        end_datetime = pd.to_datetime(end, format=format)
-        super().__init__(start_datetime, end_datetime, format, format)
-        if self.is_set():
-            if self.start_datetime > self.end_datetime:
-                raise ValueError(
-                    "time inversion found: {:s} > {:s}".format(
-                        str(self.start_datetime), str(self.end_datetime)
-                    )
+        start, end = _parse(start, format), _parse(end, format)
+        if start is not None and end is not None and start > end:
+            raise ValueError(
+                "time inversion found: {:s} > {:s}".format(
+                    str(to_datetime(start)), str(to_datetime(end))
                 )
+            )
+        object.__setattr__(self, "_start", start)
+        object.__setattr__(self, "_end", end)
+        object.__setattr__(self, "format", format)
+        if profiling.active:
+            profiling.count_timerange()
+
+    @classmethod
+    def _from_ns(cls, start: Optional[int], end: Optional[int],
+                 format: str = '%d.%m.%Y %H:%M') -> TimeRange:
+        """Creates a TimeRange from nanoseconds since epoch without parsing or validation."""
+        timerange = object.__new__(cls)
+        object.__setattr__(timerange, "_start", None if start is None else int(start))
+        object.__setattr__(timerange, "_end", None if end is None else int(end))
+        object.__setattr__(timerange, "format", format)
+        if profiling.active:
+            profiling.count_timerange()
+        return timerange
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TimeRange is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("TimeRange is immutable")
+
+    def __reduce__(self):
+        return TimeRange._from_ns, (self._start, self._end, self.format)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, TimeRange):
+            return NotImplemented
+        return self._start == other._start and self._end == other._end
+
+    def __hash__(self) -> int:
+        return hash((self._start, self._end))
+
+    def __repr__(self) -> str:
+        return " - ".join((self.get_start_time_str(), self.get_end_time_str()))
+
+    def __contains__(self, x) -> bool:
+        """Tests whether a timestamp or a TimeRange lies within the TimeRange."""
+        self.validate_time_inversion()
+        if isinstance(x, TimeRange):
+            return x._start >= self._start and x._end <= self._end
+        return self._start <= to_ns(x) <= self._end
+
+    @property
+    def start_ns(self) -> Optional[int]:
+        """Start in nanoseconds since epoch."""
+        return self._start
 
-    def convert(self, x: DateTimeRange | List[DateTimeRange]) -> TimeRange | List[TimeRange]:
-        """Converts a (list of) DateTimeRange object(s) to (a list of) DTR object(s)"""
+    @property
+    def end_ns(self) -> Optional[int]:
+        """End in nanoseconds since epoch."""
+        return self._end
+
+    @property
+    def start_datetime(self) -> Optional[pd.Timestamp]:
+        return None if self._start is None else to_timestamp(self._start)
+
+    @property
+    def end_datetime(self) -> Optional[pd.Timestamp]:
+        return None if self._end is None else to_timestamp(self._end)
+
+    @property
+    def start_time_format(self) -> str:
+        return self.format
+
+    @property
+    def end_time_format(self) -> str:
+        return self.format
+
+    @property
+    def timedelta(self) -> pd.Timedelta:
+        if not self.is_valid_timerange():
+            return to_timedelta(0)
+        return to_timedelta(self._end - self._start)
+
+    def get_start_time_str(self) -> str:
+        if self._start is None:
+            return self.NOT_A_TIME_STR
+        return to_datetime(self._start).strftime(self.format)
+
+    def get_end_time_str(self) -> str:
+        if self._end is None:
+            return self.NOT_A_TIME_STR
+        return to_datetime(self._end).strftime(self.format)
+
+    def get_timedelta_second(self) -> float:
+        return (self._end - self._start) / 10**9 if self.is_set() else 0.0
+
+    def is_set(self) -> bool:
+        return self._start is not None and self._end is not None
+
+    def validate_time_inversion(self) -> None:
+        """Raises TypeError if the TimeRange is not set. Inversions are
+        already rejected when the TimeRange is created."""
+        if not self.is_set():
+            raise TypeError
+
+    def is_valid_timerange(self) -> bool:
+        return self.is_set()
+
+    def convert(self, x: TimeRange | List[TimeRange]) -> TimeRange | List[TimeRange]:
+        """Converts a (list of) DateTimeRange-like object(s) to (a list of) TimeRange object(s)"""
         if isinstance(x, list):
-            converted = []
-            for elem in x:
-                converted.append(TimeRange(start=elem.start_datetime,
-                                           end=elem.end_datetime, format=self.format))
-            return converted
+            return [self.convert(elem) for elem in x]
+        if isinstance(x, TimeRange):
+            return TimeRange._from_ns(x._start, x._end, self.format)
         return TimeRange(start=x.start_datetime, end=x.end_datetime, format=self.format)
 
-    @DateTimeRange.timedelta.getter
-    def timedelta(self):
-        if not self.is_valid_timerange():
-            return pd.Timedelta(value=0)
-        return self.end_datetime - self.start_datetime
+    def is_intersection(self, x: TimeRange) -> bool:
+        return self.intersection(x).is_set()
 
     def intersection(self, x: TimeRange) -> TimeRange:
-        """Wrapper for intersection method from parent class DateTimeRange."""
-        return self.convert(super(TimeRange, self).intersection(x))
+        """Returns the overlap with x, which is not set if they do not overlap or touch."""
+        self.validate_time_inversion()
+        x.validate_time_inversion()
+        if self._start <= x._start <= self._end or x._start <= self._start <= x._end:
+            return TimeRange._from_ns(max(self._start, x._start), min(self._end, x._end), self.format)
+        return TimeRange._from_ns(None, None, self.format)
 
     def encompass(self, x: TimeRange) -> TimeRange:
-        """Wrapper for encompass method from parent class DateTimeRange."""
-        return self.convert(super(TimeRange, self).encompass(x))
+        """Returns the smallest TimeRange containing both TimeRanges."""
+        self.validate_time_inversion()
+        x.validate_time_inversion()
+        return TimeRange._from_ns(min(self._start, x._start), max(self._end, x._end), self.format)
 
-    def subtract(self, x: TimeRange) -> TimeRange | List[TimeRange]:
-        """Wrapper for substract method from parent class DateTimeRange."""
-        return self.convert(super(TimeRange, self).subtract(x))
+    def subtract(self, x: TimeRange) -> List[TimeRange]:
+        """Returns the parts of the TimeRange not covered by x."""
+        overlap = self.intersection(x)
+        # no overlap, the TimeRange itself remains
+        if not overlap.is_set() or overlap._end <= overlap._start:
+            return [self]
+        remaining = []
+        if overlap._start > self._start:
+            remaining.append(TimeRange._from_ns(self._start, overlap._start, self.format))
+        if overlap._end < self._end:
+            remaining.append(TimeRange._from_ns(overlap._end, self._end, self.format))
+        return remaining
 
-    def split(self, separator: TimeRange) -> TimeRange | List[TimeRange]:
-        """Wrapper for split method from parent class DateTimeRange."""
-        return self.convert(super(TimeRange, self).split(separator))
+    def split(self, separator: pd.Timestamp) -> List[TimeRange]:
+        """Splits the TimeRange into two at separator. Returns the TimeRange itself
+        if separator does not lie strictly inside it."""
+        self.validate_time_inversion()
+        separator = to_ns(separator)
+        if not self._start < separator < self._end:
+            return [self]
+        return [TimeRange._from_ns(self._start, separator, self.format),
+                TimeRange._from_ns(separator, self._end, self.format)]
 
     def copy(self) -> TimeRange:
-        """Return a copy of the instance object."""
-        return TimeRange(start=self.start, end=self.end, format=self.format)
+        """Return the instance object itself, as TimeRanges are immutable."""
+        return self
 
     def differences(self, subt_dtrs: List[TimeRange]) -> List[TimeRange]:
         """
@@ -96,12 +230,11 @@ class TimeRange(DateTimeRange):
 
     @staticmethod
     def from_strftime_day(date_strftime: str, strftime_format: str = '%d.%m.%Y') -> TimeRange:
-        date_ts = pd.to_datetime(
-            date_strftime, format=strftime_format)
-        date_ts_next = (date_ts +
-                        pd.Timedelta(value=1, unit='d') - pd.Timedelta.resolution)
+        date_ns = parse_ns(date_strftime, strftime_format)
+        # last nanosecond of the day
+        date_ns_next = date_ns + 24 * 3600 * 10**9 - 1
         # TODO string format
-        return TimeRange(date_ts, date_ts_next, strftime_format+' %H:%M')
+        return TimeRange._from_ns(date_ns, date_ns_next, strftime_format+' %H:%M')
 
     @staticmethod
     def validate(dtrs: List[TimeRange]) -> None:
@@ -131,7 +264,7 @@ class TimeRange(DateTimeRange):
             return dtrs
 
         dtrs = list(filter(lambda x: x.is_set(), dtrs))
-        dtrs.sort(key=lambda x: x.start_datetime, reverse=False)
+        dtrs.sort(key=lambda x: x.start_ns, reverse=False)
         joined = [dtrs[0].copy()]
 
         for i in range(1, len(dtrs)):
@@ -25,6 +25,12 @@ class CustomStrategies:
 
     """
 
+    # bounds of the timeranges generated by dtr_tp, also used by the benchmarks
+    VMIN_DATETIME = datetime.datetime(year=2021, month=3, day=1, hour=8, minute=0, second=0)
+    VMAX_DATETIME = datetime.datetime(year=2021, month=8, day=1, hour=8, minute=0, second=0)
+    VMIN_TIMEDELTA = pd.Timedelta(value=1, unit="seconds")
+    VMAX_TIMEDELTA = pd.Timedelta(value=24, unit="hours")
+
     @staticmethod
     def dtr_as_tuple():
         """
@@ -54,23 +60,33 @@ class CustomStrategies:
         as tuples composed of start and end datetimes.
         """
         # generate start_datetime
-        vmin_datetime = datetime.datetime(
-            year=2021, month=3, day=1, hour=8, minute=0, second=0)
-        vmax_datetime = datetime.datetime(
-            year=2021, month=8, day=1, hour=8, minute=0, second=0)
         st_start_datetime = st.datetimes(
-            min_value=vmin_datetime, max_value=vmax_datetime, allow_imaginary=False).map(truncate)
+            min_value=CustomStrategies.VMIN_DATETIME, max_value=CustomStrategies.VMAX_DATETIME,
+            allow_imaginary=False).map(truncate)
         start_datetime = draw(st_start_datetime)
         # generate a timedelta
-        vmin_timedelta = pd.Timedelta(value=1, unit="seconds")
-        vmax_timedelta = pd.Timedelta(value=24, unit="hours")
         st_timedelta = st.timedeltas(
-            min_value=vmin_timedelta, max_value=vmax_timedelta).map(truncate_timedelta)
+            min_value=CustomStrategies.VMIN_TIMEDELTA,
+            max_value=CustomStrategies.VMAX_TIMEDELTA).map(truncate_timedelta)
         timedelta = draw(st_timedelta)
         # generate end_datetime
         end_datetime = start_datetime + timedelta
         return (start_datetime, end_datetime)
 
+    @staticmethod
+    @st.composite
+    def dtr_grid_tp(draw):
+        """
+        Returns Hypothesis strategy for generating time intervals on an
+        hourly grid within two days, as tuples composed of start and end
+        datetimes. Many of them are zero-length or touch each other.
+        """
+        start_datetime = CustomStrategies.VMIN_DATETIME + datetime.timedelta(
+            hours=draw(st.integers(min_value=0, max_value=47)))
+        end_datetime = start_datetime + datetime.timedelta(
+            hours=draw(st.integers(min_value=0, max_value=6)))
+        return (start_datetime, end_datetime)
+
     @ staticmethod
     def list_timedeltas():
         vmin = pd.Timedelta(value=0, unit="seconds")
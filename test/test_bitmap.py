@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the bitmap representation of timelines.
+"""
+
+import pytest
+import pandas as pd
+from hypothesis import given, settings, strategies as st
+from src.timeline import TimeLine, UnsuficientTimedeltaError
+from src.bitmap import BitmapTimeLine
+from .custom_strategies import CustomStrategies as cs
+
+GRID = pd.Timedelta("5 min")
+
+
+def on_grid(list_tuples):
+    """Rounds the generated timeranges to the grid, dropping the empty ones."""
+    timeranges = [(pd.Timestamp(start).floor(GRID), pd.Timestamp(end).ceil(GRID))
+                  for start, end in list_tuples]
+    return TimeLine(timeranges)
+
+
+def without_points(timeline):
+    """Drops the zero-length timeranges, which bitmaps cannot represent."""
+    return TimeLine([timerange for timerange in timeline if timerange.get_timedelta_second() > 0])
+
+
+class TestBitmap:
+
+    shifts = TimeLine([("01.03.2021 06:00", "01.03.2021 09:30"),
+                       ("01.03.2021 09:45", "01.03.2021 14:00")])
+    breaks = TimeLine([("01.03.2021 09:00", "01.03.2021 10:00"),
+                       ("01.03.2021 12:00", "01.03.2021 12:05")])
+
+    def test_conversion(self):
+        bitmap = BitmapTimeLine.from_timeline(self.shifts)
+        assert bitmap.n_slots == 8 * 12
+        assert bitmap.timedelta == self.shifts.timedelta
+        assert bitmap.to_timeline() == self.shifts
+
+    def test_operations(self):
+        shifts, breaks = BitmapTimeLine.from_timeline(self.shifts), BitmapTimeLine.from_timeline(self.breaks)
+        assert (shifts & breaks).to_timeline() == self.shifts.intersection(self.breaks)
+        assert (shifts - breaks).to_timeline() == self.shifts.difference(self.breaks)
+        assert (shifts | breaks).to_timeline() == self.shifts + self.breaks
+
+    def test_consume(self):
+        bitmap = BitmapTimeLine.from_timeline(self.shifts)
+        consumed = bitmap.consume(pd.Timedelta("4 hours"))
+        expected = self.shifts.copy()
+        assert consumed.to_timeline() == expected.consume(pd.Timedelta("4 hours"))
+        assert bitmap.to_timeline() == expected
+        with pytest.raises(ValueError):
+            bitmap.consume(pd.Timedelta("1 min"))
+        with pytest.raises(UnsuficientTimedeltaError):
+            bitmap.consume(pd.Timedelta("4 hours"))
+
+    def test_touching_timeranges_do_not_intersect(self):
+        touching = TimeLine([("01.03.2021 14:00", "01.03.2021 15:00")])
+        assert self.shifts.intersection(touching) == TimeLine([("01.03.2021 14:00", "01.03.2021 14:00")])
+        bitmap = BitmapTimeLine.from_timeline(self.shifts) & BitmapTimeLine.from_timeline(touching)
+        assert not bitmap.is_valid
+
+    def test_raises_error_on_boundaries_off_grid(self):
+        with pytest.raises(ValueError):
+            BitmapTimeLine.from_timeline(TimeLine([("01.03.2021 06:01", "01.03.2021 07:00")]))
+
+    def test_raises_error_on_different_grids(self):
+        hourly = BitmapTimeLine.from_timeline(self.shifts, resolution=pd.Timedelta("15 min"))
+        with pytest.raises(ValueError):
+            hourly & BitmapTimeLine.from_timeline(self.breaks)
+
+    @given(list_tuples=st.lists(cs.dtr_tp(), max_size=20),
+           other_tuples=st.lists(cs.dtr_tp(), max_size=20))
+    @settings(deadline=None, max_examples=50)
+    def test_operations_match_timeline_property(self, list_tuples, other_tuples):
+        timeline, other = on_grid(list_tuples), on_grid(other_tuples)
+        bitmap, other_bitmap = BitmapTimeLine.from_timeline(timeline), BitmapTimeLine.from_timeline(other)
+        assert bitmap.to_timeline() == timeline
+        assert (bitmap & other_bitmap).to_timeline() == without_points(timeline.intersection(other))
+        assert (bitmap - other_bitmap).to_timeline() == timeline.difference(other)
+        assert (bitmap | other_bitmap).to_timeline() == timeline + other
+
+    @given(list_tuples=st.lists(cs.dtr_tp(), max_size=20), n_slots=st.lists(
+        st.integers(0, 100), min_size=1, max_size=5))
+    @settings(deadline=None, max_examples=50)
+    def test_consume_matches_timeline_property(self, list_tuples, n_slots):
+        timeline = on_grid(list_tuples)
+        bitmap = BitmapTimeLine.from_timeline(timeline)
+        for n in n_slots:
+            if n * GRID > timeline.timedelta:
+                return
+            assert bitmap.consume(n * GRID).to_timeline() == timeline.consume(n * GRID)
+            assert bitmap.to_timeline() == timeline
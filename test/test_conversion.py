@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the conversions to nanoseconds and of the pandas-free import.
+"""
+
+import datetime
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+from hypothesis import given, strategies as st
+from src.conversion import NAT, parse_ns, to_ns, to_ns_array, to_ns_delta
+
+
+class TestConversion:
+
+    @given(timestamp=st.datetimes(min_value=datetime.datetime(1900, 1, 1),
+                                  max_value=datetime.datetime(2200, 1, 1)))
+    def test_to_ns_matches_pandas_property(self, timestamp):
+        expected = pd.Timestamp(timestamp).value
+        assert to_ns(timestamp) == expected
+        assert to_ns(pd.Timestamp(timestamp)) == expected
+        assert to_ns(np.datetime64(timestamp)) == expected
+        assert to_ns(timestamp.isoformat()) == expected
+
+    def test_to_ns_of_aware_datetime(self):
+        timestamp = datetime.datetime(2021, 3, 1, 8, tzinfo=datetime.timezone.utc)
+        assert to_ns(timestamp) == pd.Timestamp(timestamp).value
+
+    @given(timedelta=st.timedeltas(min_value=datetime.timedelta(days=-1000),
+                                   max_value=datetime.timedelta(days=1000)))
+    def test_to_ns_delta_matches_pandas_property(self, timedelta):
+        expected = pd.Timedelta(timedelta).value
+        assert to_ns_delta(timedelta) == expected
+        assert to_ns_delta(pd.Timedelta(timedelta)) == expected
+        assert to_ns_delta(np.timedelta64(timedelta)) == expected
+
+    def test_strings_which_only_pandas_parses(self):
+        assert to_ns("1 March 2021") == pd.Timestamp("2021-03-01").value
+        assert to_ns_delta("2 hours") == pd.Timedelta("2 hours").value
+
+    def test_to_ns_array(self):
+        strings = ["01.03.2021 08:00", None, "02.03.2021 08:00"]
+        expected = np.asarray(pd.to_datetime(strings, format="%d.%m.%Y %H:%M")).view(np.int64)
+        assert np.array_equal(to_ns_array(strings, "%d.%m.%Y %H:%M"), expected)
+        assert np.array_equal(to_ns_array(pd.Series(strings), "%d.%m.%Y %H:%M"), expected)
+        assert to_ns_array([]).dtype == np.int64
+        assert to_ns_array([None])[0] == NAT
+
+    def test_to_ns_array_of_many_strings(self):
+        fmt = "%d.%m.%Y %H:%M"
+        datetimes = [datetime.datetime(2021, 3, 1) + datetime.timedelta(minutes=7 * i)
+                     for i in range(1000)]
+        strings = [dt.strftime(fmt) for dt in datetimes]
+        expected = np.array([parse_ns(string, fmt) for string in strings])
+        assert np.array_equal(to_ns_array(strings, fmt), expected)
+        assert np.array_equal(to_ns_array(tuple(strings), fmt), expected)
+        # strings mixed with datetimes are converted one by one
+        mixed = strings[:500] + datetimes[500:]
+        assert np.array_equal(to_ns_array(mixed, fmt), expected)
+
+    def test_parse_ns(self):
+        assert parse_ns("01.03.2021 08:00", "%d.%m.%Y %H:%M") == pd.Timestamp("2021-03-01 08:00").value
+
+
+class TestImport:
+
+    def test_core_is_imported_without_pandas(self):
+        code = ("import sys; import src.timeline; "
+                "sys.exit(int(any(m.split('.')[0] in ('pandas', 'dateutil') for m in sys.modules)))")
+        assert subprocess.run([sys.executable, "-c", code]).returncode == 0
+
+    def test_few_strings_are_parsed_without_pandas(self):
+        code = ("import sys; from src.timeline import TimeLine; "
+                "TimeLine([('01.03.2021 08:00', '01.03.2021 10:00')] * 1000); "
+                "sys.exit(int('pandas' in sys.modules))")
+        assert subprocess.run([sys.executable, "-c", code]).returncode == 0
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the chunked, out-of-core ingest of interval files.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from hypothesis import given, settings, strategies as st
+from src.timeline import TimeLine
+from src.ingest import iter_csv_chunks, merge_chunks, _merge_runs
+from .custom_strategies import CustomStrategies as cs
+
+
+def write_csv(path, list_tuples):
+    pd.DataFrame(list_tuples, columns=["start", "end"]).to_csv(path, index=False)
+
+
+class TestFromCsv:
+
+    def test_from_csv_merges_across_chunks(self, tmp_path):
+        path = tmp_path / "states.csv"
+        write_csv(path, [("01.03.2021 10:00", "01.03.2021 14:00"),
+                         ("02.03.2021 08:00", "02.03.2021 09:00"),
+                         ("01.03.2021 08:00", "01.03.2021 11:00"),
+                         ("01.03.2021 14:00", "01.03.2021 15:00"),
+                         ("03.03.2021 08:00", "03.03.2021 09:00")])
+        timeline = TimeLine.from_csv(path, chunksize=2)
+        assert timeline == TimeLine([("01.03.2021 08:00", "01.03.2021 15:00"),
+                                     ("02.03.2021 08:00", "02.03.2021 09:00"),
+                                     ("03.03.2021 08:00", "03.03.2021 09:00")])
+
+    def test_from_csv_of_empty_file(self, tmp_path):
+        path = tmp_path / "states.csv"
+        write_csv(path, [])
+        assert not TimeLine.from_csv(path).is_valid
+
+    def test_spilled_runs_are_removed(self, tmp_path):
+        path = tmp_path / "states.csv"
+        write_csv(path, [("01.03.2021 10:00", "01.03.2021 14:00")] * 3)
+        spill_dir = tmp_path / "runs"
+        spill_dir.mkdir()
+        TimeLine.from_csv(path, chunksize=1, spill_dir=spill_dir)
+        assert list(spill_dir.iterdir()) == []
+
+    def test_csv_file_is_closed_when_consumer_stops_early(self, tmp_path, monkeypatch):
+        path = tmp_path / "states.csv"
+        write_csv(path, [("01.03.2021 10:00", "01.03.2021 14:00")] * 3)
+        closed, read_csv = [], pd.read_csv
+
+        def spy_read_csv(*args, **kwargs):
+            reader = read_csv(*args, **kwargs)
+            close = reader.close
+            reader.close = lambda: closed.append(True) or close()
+            return reader
+        monkeypatch.setattr(pd, "read_csv", spy_read_csv)
+        for _ in iter_csv_chunks(path, chunksize=1):
+            assert not closed
+            break
+        assert closed
+
+    def test_from_parquet(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        path = tmp_path / "states.parquet"
+        pd.DataFrame({"start": pd.to_datetime(["2021-03-01 10:00", "2021-03-01 08:00"]),
+                      "end": pd.to_datetime(["2021-03-01 14:00", "2021-03-01 11:00"])}
+                     ).to_parquet(path)
+        assert TimeLine.from_parquet(path, chunksize=1) == TimeLine(
+            [("01.03.2021 08:00", "01.03.2021 14:00")])
+
+
+class TestMergeChunks:
+
+    @given(list_tuples=st.lists(cs.dtr_tp(), max_size=40),
+           chunksize=st.integers(1, 8), block_size=st.integers(1, 4))
+    @settings(deadline=None, max_examples=50)
+    def test_merge_chunks_equals_merge_property(self, list_tuples, chunksize, block_size):
+        df = pd.DataFrame(list_tuples, columns=["start", "end"])
+        chunks = (df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize))
+        assert merge_chunks(chunks, block_size=block_size) == TimeLine(list_tuples)
+
+    def test_merge_runs_with_equal_starts_in_next_block(self):
+        runs = [np.array([[0, 2, 4], [1, 3, 10]]), np.array([[4, 20], [5, 21]])]
+        starts, ends = _merge_runs(runs, block_size=1)
+        assert starts.tolist() == [0, 2, 4, 20]
+        assert ends.tolist() == [1, 3, 10, 21]
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the parallel jobs over timelines in shared memory.
+"""
+
+import os
+import pickle
+import pytest
+import pandas as pd
+from src.timeline import TimeLine, UnsuficientTimedeltaError
+from src.parallel import SharedTimeLines, _default_chunksize, parallel_consume, parallel_intersection
+
+
+def machines():
+    return [TimeLine([("01.03.2021 08:00", "01.03.2021 12:00"),
+                      ("01.03.2021 13:00", "01.03.2021 17:00")]),
+            TimeLine(),
+            TimeLine([("2021-03-01 10:00", "2021-03-01 16:00")], ts_format="%Y-%m-%d %H:%M")]
+
+
+class TestParallel:
+
+    def test_parallel_consume(self):
+        timelines = machines()
+        timedeltas = [pd.Timedelta("5 hours"), pd.Timedelta(0), pd.Timedelta("1 hour")]
+        with SharedTimeLines(timelines) as shared:
+            consumed = parallel_consume(shared, timedeltas, max_workers=2, chunksize=1)
+        assert consumed == [timeline.consume(timedelta, update=False)[0]
+                            for timeline, timedelta in zip(timelines, timedeltas)]
+        assert consumed[2].ts_format == "%Y-%m-%d %H:%M"
+
+    def test_parallel_consume_raises_error(self):
+        with SharedTimeLines(machines()) as shared:
+            with pytest.raises(UnsuficientTimedeltaError):
+                parallel_consume(shared, [pd.Timedelta("9 hours")] * 3, max_workers=2)
+
+    def test_parallel_intersection(self):
+        timelines = machines()
+        pairs = [(0, 2), (2, 0), (0, 1)]
+        with SharedTimeLines(timelines) as shared:
+            intersections = parallel_intersection(shared, pairs, max_workers=2)
+        assert intersections == [timelines[i].intersection(timelines[j]) for i, j in pairs]
+
+    def test_default_chunksize_uses_number_of_cpus(self, monkeypatch):
+        monkeypatch.setattr(os, "cpu_count", lambda: 16)
+        assert _default_chunksize(1000, None) == 15
+        assert _default_chunksize(1000, 2) == 125
+        assert _default_chunksize(10, None) == 1
+
+    def test_unsuficient_timedelta_error_can_be_pickled(self):
+        error = UnsuficientTimedeltaError(pd.Timedelta("1 hour"), pd.Timedelta("2 hours"))
+        assert str(pickle.loads(pickle.dumps(error))) == str(error)
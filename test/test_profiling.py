@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the instrumentation of the TimeLine hot paths.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from src import profiling
+from src.profiling import profile
+from src.timerange import TimeRange
+from src.timeline import TimeLine
+
+
+def timeline():
+    return TimeLine([("01.03.2021 08:00", "01.03.2021 12:00"),
+                     ("01.03.2021 13:00", "01.03.2021 17:00")])
+
+
+class TestProfile:
+
+    def test_operation_stats(self):
+        shifts, maintenance = timeline(), TimeLine([("01.03.2021 11:00", "01.03.2021 14:00")])
+        with profile() as stats:
+            shifts.intersection(maintenance)
+            shifts.consume(pd.Timedelta("5 hours"))
+            shifts.copy()
+        assert stats.stats["inter_diff"].as_dict() == {
+            "calls": 1, "seconds": stats.stats["inter_diff"].seconds, "timeranges_created": 0,
+            "input_ranges": 3, "output_ranges": 4}
+        # consume splits the timeline into the consumed and the remaining part
+        assert stats.stats["consume"].calls == 1
+        assert stats.stats["consume"].output_ranges == 2
+        assert stats.stats["copy"].input_ranges == 1
+        assert "consume" in stats.report()
+
+    def test_timeranges_created_are_counted(self):
+        shifts = timeline()
+        with profile() as stats:
+            shifts.timeranges
+            TimeRange("01.03.2021 08:00", "01.03.2021 09:00")
+        assert stats.timeranges_created == 3
+
+    def test_timeranges_created_by_many_threads_are_counted(self):
+        with profile() as stats:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda _: timeline().timeranges, range(400)))
+        assert stats.timeranges_created == 800
+
+    def test_nothing_is_recorded_outside_profile(self):
+        with profile() as stats:
+            pass
+        timeline().consume(pd.Timedelta("1 hour"))
+        assert stats.stats == {} and stats.timeranges_created == 0
+        assert profiling.active == []
+
+    def test_nested_profiles(self):
+        with profile() as outer:
+            with profile() as inner:
+                timeline().copy()
+                TimeRange("01.03.2021 08:00", "01.03.2021 09:00")
+            timeline().copy()
+        assert inner.stats["copy"].calls == 1 and inner.timeranges_created == 1
+        # the outer profile also records the calls made within the inner one
+        assert outer.stats["copy"].calls == 2 and outer.timeranges_created == 1
+        assert [event["name"] for event in outer.events] == 2 * [event["name"] for event in inner.events]
+
+    def test_chrome_trace(self, tmp_path):
+        with profile() as stats:
+            timeline().consume(pd.Timedelta("1 hour"))
+        path = tmp_path / "trace.json"
+        stats.to_chrome_trace(path)
+        events = json.loads(path.read_text())["traceEvents"]
+        assert {event["name"] for event in events} >= {"consume", "merge"}
+        assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the max segment tree used by TimeLine.find_slot.
+"""
+
+import numpy as np
+from hypothesis import given, strategies as st
+from src.segmenttree import MaxSegmentTree
+
+
+class TestFirstAtLeast:
+
+    def test_first_at_least(self):
+        tree = MaxSegmentTree(np.array([3, 1, 4, 1, 5, 9, 2, 6]))
+        assert tree.first_at_least(4) == 2
+        assert tree.first_at_least(4, start=3) == 4
+        assert tree.first_at_least(7, start=6) == -1
+        assert tree.max == 9
+
+    def test_empty_tree(self):
+        tree = MaxSegmentTree(np.array([], dtype=np.int64))
+        assert tree.first_at_least(0) == -1
+
+    @given(values=st.lists(st.integers(0, 100), min_size=1, max_size=50),
+           updates=st.lists(st.tuples(st.integers(0, 49), st.integers(0, 100)), max_size=10),
+           threshold=st.integers(0, 100), start=st.integers(0, 50))
+    def test_first_at_least_equals_linear_scan_property(self, values, updates, threshold, start):
+        tree = MaxSegmentTree(np.array(values))
+        for i, value in updates:
+            if i < len(values):
+                values[i] = value
+                tree.update(i, value)
+        expected = next((i for i in range(start, len(values)) if values[i] >= threshold), -1)
+        assert tree.first_at_least(threshold, start) == expected
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the lazily materialized shift calendar.
+"""
+
+import itertools
+import pytest
+import pandas as pd
+from src.timerange import TimeRange
+from src.timeline import TimeLine, UnsuficientTimedeltaError
+from src.shiftcalendar import ShiftCalendar
+
+
+def calendar(**kwargs):
+    """Two shifts with a break from monday to friday, christmas off."""
+    return ShiftCalendar(
+        {weekday: [("06:00", "09:30"), ("10:00", "14:00")] for weekday in range(5)},
+        exceptions={"24.12.2021": [], "25.12.2021": [("08:00", "12:00")]}, **kwargs)
+
+
+class TestWindow:
+
+    def test_window_clips_shifts(self):
+        window = calendar().window(pd.Timestamp("2021-12-20 09:00"), pd.Timestamp("2021-12-21 07:00"))
+        assert window == TimeLine([
+            ("20.12.2021 09:00", "20.12.2021 09:30"),
+            ("20.12.2021 10:00", "20.12.2021 14:00"),
+            ("21.12.2021 06:00", "21.12.2021 07:00")])
+
+    def test_window_applies_exceptions(self):
+        window = calendar().window(pd.Timestamp("2021-12-24"), pd.Timestamp("2021-12-27"))
+        assert window == TimeLine([("25.12.2021 08:00", "25.12.2021 12:00")])
+
+    def test_overnight_shifts_end_on_next_day(self):
+        night_shifts = ShiftCalendar({6: [("22:00", "06:00")]})
+        window = night_shifts.window(pd.Timestamp("2021-12-27"), pd.Timestamp("2021-12-28"))
+        assert window == TimeLine([("27.12.2021 00:00", "27.12.2021 06:00")])
+
+    def test_window_equals_generated_timeranges(self):
+        start, end = pd.Timestamp("2021-12-01 12:00"), pd.Timestamp("2022-01-15")
+        shifts = calendar()
+        assert shifts.window(start, end) == TimeLine(list(shifts.iter_timeranges(start, end)))
+
+
+class TestLazyOperations:
+
+    def test_iter_timeranges_is_unbounded(self):
+        timeranges = list(itertools.islice(calendar().iter_timeranges(pd.Timestamp("2021-12-24")), 3))
+        assert timeranges == [TimeRange("25.12.2021 08:00", "25.12.2021 12:00"),
+                              TimeRange("27.12.2021 06:00", "27.12.2021 09:30"),
+                              TimeRange("27.12.2021 10:00", "27.12.2021 14:00")]
+
+    def test_cache_is_bounded(self):
+        shifts = calendar(cache_size=4)
+        shifts.window(pd.Timestamp("2021-01-01"), pd.Timestamp("2023-01-01"))
+        assert len(shifts._weeks) == 4
+
+    def test_consume(self):
+        consumed = calendar().consume(pd.Timedelta("40 hours"), pd.Timestamp("2021-12-23 12:00"))
+        assert consumed.start_time == pd.Timestamp("2021-12-23 12:00")
+        assert consumed.timedelta == pd.Timedelta("40 hours")
+        assert consumed.end_time == pd.Timestamp("2021-12-31 10:30")
+
+    def test_consume_far_ahead(self):
+        consumed = calendar().consume(pd.Timedelta("5000 hours"), pd.Timestamp("2021-01-01"))
+        assert consumed.timedelta == pd.Timedelta("5000 hours")
+
+    def test_consume_raises_error_if_calendar_is_exhausted(self):
+        shifts = ShiftCalendar({}, exceptions={"25.12.2021": [("08:00", "12:00")]})
+        with pytest.raises(UnsuficientTimedeltaError):
+            shifts.consume(pd.Timedelta("5 hours"), pd.Timestamp("2021-12-01"))
+
+    def test_split_and_intersection(self):
+        shifts = calendar()
+        left, right = shifts.split(pd.Timestamp("2021-12-20 12:00"),
+                                   pd.Timestamp("2021-12-20"), pd.Timestamp("2021-12-21"))
+        assert left + right == shifts.window(pd.Timestamp("2021-12-20"), pd.Timestamp("2021-12-21"))
+        maintenance = TimeLine([("24.12.2021 00:00", "27.12.2021 07:00")])
+        assert shifts.intersection(maintenance) == TimeLine([
+            ("25.12.2021 08:00", "25.12.2021 12:00"),
+            ("27.12.2021 06:00", "27.12.2021 07:00")])
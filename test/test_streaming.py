@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of timelines backed by an iterator of timeranges.
+"""
+
+import pytest
+import pandas as pd
+from hypothesis import given, settings, strategies as st
+from src.timerange import TimeRange
+from src.timeline import TimeLine, UnsuficientTimedeltaError
+from src.shiftcalendar import ShiftCalendar
+from src.streaming import StreamingTimeLine
+from .custom_strategies import CustomStrategies as cs
+
+
+class TestStreamingConsume:
+
+    def test_consume_pulls_only_needed_timeranges(self):
+        def timeranges():
+            day = pd.Timestamp("2021-03-01 08:00")
+            while True:
+                yield TimeRange(day, day + pd.Timedelta("8 hours"))
+                day += pd.Timedelta("1 day")
+
+        stream = StreamingTimeLine(timeranges(), chunk_size=2)
+        consumed = stream.consume(pd.Timedelta("20 hours"))
+        assert consumed.end_time == pd.Timestamp("2021-03-03 12:00")
+        assert stream.buffered == TimeLine([("03.03.2021 12:00", "03.03.2021 16:00"),
+                                            ("04.03.2021 08:00", "04.03.2021 16:00")])
+
+    def test_overlapping_timeranges_of_later_chunks_are_merged(self):
+        stream = StreamingTimeLine([("01.03.2021 08:00", "01.03.2021 12:00"),
+                                    ("01.03.2021 10:00", "01.03.2021 14:00")], chunk_size=1)
+        assert stream.consume(pd.Timedelta("4 hours")) == TimeLine(
+            [("01.03.2021 08:00", "01.03.2021 12:00")])
+        assert stream.consume(pd.Timedelta("2 hours")) == TimeLine(
+            [("01.03.2021 12:00", "01.03.2021 14:00")])
+        assert stream.is_exhausted
+
+    def test_raises_error_if_source_is_exhausted(self):
+        stream = StreamingTimeLine([("01.03.2021 08:00", "01.03.2021 12:00")])
+        with pytest.raises(UnsuficientTimedeltaError):
+            stream.consume(pd.Timedelta("5 hours"))
+        assert stream.consume(pd.Timedelta("4 hours")).timedelta == pd.Timedelta("4 hours")
+
+    def test_raises_error_if_timeranges_are_not_ordered(self):
+        stream = StreamingTimeLine([("01.03.2021 12:00", "01.03.2021 14:00"),
+                                    ("01.03.2021 08:00", "01.03.2021 10:00")])
+        with pytest.raises(ValueError):
+            stream.consume(pd.Timedelta("1 hour"))
+
+    def test_shift_calendar_stream(self):
+        calendar = ShiftCalendar({weekday: [("06:00", "14:00")] for weekday in range(5)})
+        stream = StreamingTimeLine(calendar.iter_timeranges(pd.Timestamp("2021-01-01")))
+        for _ in range(100):
+            stream.consume(pd.Timedelta("30 hours"))
+        assert len(stream.buffered) <= stream.chunk_size
+
+    @given(list_tuples=st.lists(cs.dtr_tp(), min_size=1, max_size=20),
+           list_timedeltas=cs.list_timedeltas(), chunk_size=st.integers(1, 5))
+    @settings(deadline=None)
+    def test_stream_equals_timeline_property(self, list_tuples, list_timedeltas, chunk_size):
+        timeranges = sorted((TimeRange(*tpl) for tpl in list_tuples), key=lambda x: x.start_ns)
+        timeline = TimeLine(timeranges)
+        stream = StreamingTimeLine(timeranges, chunk_size=chunk_size)
+        for timedelta in list_timedeltas:
+            if timedelta > timeline.timedelta:
+                with pytest.raises(UnsuficientTimedeltaError):
+                    stream.consume(timedelta)
+                return
+            assert stream.consume(timedelta) == timeline.consume(timedelta)
+
+
+class TestStreamingSplit:
+
+    def test_split(self):
+        stream = StreamingTimeLine(TimeLine([("01.03.2021 08:00", "01.03.2021 10:00"),
+                                             ("01.03.2021 12:00", "01.03.2021 15:00")]))
+        left, right = stream.split(pd.Timestamp("2021-03-01 13:00"))
+        assert left == TimeLine([("01.03.2021 08:00", "01.03.2021 10:00"),
+                                 ("01.03.2021 12:00", "01.03.2021 13:00")])
+        assert right is stream
+        assert stream.consume(pd.Timedelta("2 hours")) == TimeLine(
+            [("01.03.2021 13:00", "01.03.2021 15:00")])
@@ -7,18 +7,32 @@ Created on Sat Jul 15 10:41:39 2021
 
 """
 
+import itertools
+import pickle
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pytest
+import numpy as np
 import pandas as pd
 from hypothesis import given, settings, strategies as st
 from src.timerange import TimeRange
 from src.timeline import TimeLine, UnsuficientTimedeltaError
+from src.memo import OperationCache
 from .custom_strategies import CustomStrategies as cs
-from .utils import flatten
+from .utils import flatten, truncate
 
 
 # pylint: disable=E1120
 
 
+@pytest.fixture
+def timeline():
+    return TimeLine([("01.03.2021 08:00", "01.03.2021 10:00"),
+                     ("01.03.2021 12:00", "01.03.2021 16:00"),
+                     ("01.03.2021 18:00", "01.03.2021 19:00")])
+
+
 class TestMerge:
 
     """Testing merge method (method automatically executes in initializer)."""
@@ -153,6 +167,31 @@ class TestSplit:
 
 class TestIntersection:
 
+    def test_touching_timeranges_intersect_in_a_point(self):
+        t1 = TimeLine([("01.05.2021 08:00", "01.05.2021 10:00"),
+                       ("01.05.2021 12:00", "01.05.2021 14:00")])
+        t2 = TimeLine([("01.05.2021 10:00", "01.05.2021 11:00"),
+                       ("01.05.2021 13:00", "01.05.2021 15:00")])
+        inter, diff = t1.inter_diff(t2)
+        assert inter.timeranges == [TimeRange("01.05.2021 10:00", "01.05.2021 10:00"),
+                                    TimeRange("01.05.2021 13:00", "01.05.2021 14:00")]
+        assert diff.timeranges == [TimeRange("01.05.2021 08:00", "01.05.2021 10:00"),
+                                   TimeRange("01.05.2021 12:00", "01.05.2021 13:00")]
+        assert inter.timeranges == [x.intersection(y) for x in t1 for y in t2 if x.is_intersection(y)]
+
+    def test_zero_length_timerange_remains_in_difference(self):
+        point = TimeLine([("01.05.2021 07:00", "01.05.2021 07:00")])
+        inter, diff = point.inter_diff(TimeLine([("01.05.2021 09:00", "01.05.2021 14:00")]))
+        assert inter == TimeLine() and diff == point
+        # like TimeRange.subtract, a zero-length overlap does not cut a timerange
+        inter, diff = point.inter_diff(TimeLine([("01.05.2021 06:00", "01.05.2021 08:00")]))
+        assert inter == point and diff == point
+
+    def test_inter_diff_with_empty_timeline_keeps_ts_format(self):
+        timeline = TimeLine([("2021-05-01 09:00", "2021-05-01 14:00")], ts_format="%Y-%m-%d %H:%M")
+        inter, diff = timeline.inter_diff(TimeLine())
+        assert inter.ts_format == diff.ts_format == "%Y-%m-%d %H:%M"
+
     @given(tuples_1=st.lists(cs.dtr_tp(), max_size=10), tuples_2=st.lists(cs.dtr_tp(), max_size=10))
     @settings(deadline=None)
     def test_intersection_timelines_property(self, tuples_1, tuples_2):
@@ -161,6 +200,20 @@ class TestIntersection:
         t2 = TimeLine([TimeRange(*tpl) for tpl in tuples_2])
         assert t1.intersection(t2) == t2.intersection(t1)
 
+    @given(tuples_1=st.lists(st.one_of(cs.dtr_tp(), cs.dtr_grid_tp()), max_size=10),
+           tuples_2=st.lists(st.one_of(cs.dtr_tp(), cs.dtr_grid_tp()), max_size=10))
+    @settings(deadline=None)
+    def test_inter_diff_matches_pairwise_timeranges_property(self, tuples_1, tuples_2):
+        """Result equals intersecting and subtracting TimeRanges pairwise,
+        including zero-length and touching timeranges."""
+        t1 = TimeLine([TimeRange(*tpl) for tpl in tuples_1])
+        t2 = TimeLine([TimeRange(*tpl) for tpl in tuples_2])
+        inter, diff = t1.inter_diff(t2)
+        expected_inter = [x.intersection(y) for x in t1 for y in t2 if x.is_intersection(y)]
+        expected_diff = flatten([x.differences(t2.timeranges) for x in t1])
+        assert inter.timeranges == expected_inter
+        assert diff.timeranges == expected_diff
+
 
 class TestDifferences:
 
@@ -326,3 +379,692 @@ class TestConsume:
             else:
                 with pytest.raises(UnsuficientTimedeltaError):
                     _ = timeline.consume(timedelta)
+
+
+class TestArrayBackend:
+
+    timeline = TimeLine([("01.05.2021 08:00", "01.05.2021 10:00"),
+                         ("01.05.2021 11:00", "01.05.2021 12:00")])
+
+    def test_timeranges_stored_as_int64_arrays(self):
+        assert self.timeline._starts.dtype == np.int64
+        assert self.timeline._ends.dtype == np.int64
+        assert self.timeline._starts[0] == pd.Timestamp("2021-05-01 08:00").value
+
+    def test_indexing_and_iteration_return_timeranges(self):
+        assert self.timeline[0] == TimeRange("01.05.2021 08:00", "01.05.2021 10:00")
+        assert self.timeline[-1] == TimeRange("01.05.2021 11:00", "01.05.2021 12:00")
+        assert self.timeline[:1] == [TimeRange("01.05.2021 08:00", "01.05.2021 10:00")]
+        assert list(self.timeline) == self.timeline.timeranges
+
+    def test_assigning_timeranges_merges_them(self):
+        timeline = TimeLine()
+        timeline.timeranges = [TimeRange("01.05.2021 08:00", "01.05.2021 10:00"),
+                               TimeRange("01.05.2021 09:00", "01.05.2021 11:00")]
+        assert timeline == TimeLine([("01.05.2021 08:00", "01.05.2021 11:00")])
+
+    @given(tuples=st.lists(cs.dtr_tp(), max_size=20))
+    @settings(deadline=None)
+    def test_merge_matches_timerange_merge_property(self, tuples):
+        timeranges = [TimeRange(*tpl) for tpl in tuples]
+        assert TimeLine(timeranges) == TimeRange.merge(timeranges)
+
+
+class TestBulkConstructors:
+
+    starts = ["01.05.2021 08:00", "01.05.2021 09:00", "01.05.2021 13:00"]
+    ends = ["01.05.2021 10:00", "01.05.2021 11:00", "01.05.2021 14:00"]
+    expected = TimeLine([("01.05.2021 08:00", "01.05.2021 11:00"),
+                         ("01.05.2021 13:00", "01.05.2021 14:00")])
+
+    def test_from_arrays(self):
+        assert TimeLine.from_arrays(self.starts, self.ends) == self.expected
+
+    def test_from_arrays_raises_error_on_time_inversion(self):
+        with pytest.raises(ValueError):
+            TimeLine.from_arrays(["01.05.2021 10:00"], ["01.05.2021 08:00"])
+
+    def test_from_arrays_ignores_missing_timestamps(self):
+        timeline = TimeLine.from_arrays(self.starts + [None], self.ends + ["01.05.2021 18:00"])
+        assert timeline == self.expected
+
+    def test_from_frame_and_to_frame(self):
+        df = pd.DataFrame({"begin": self.starts, "finish": self.ends})
+        timeline = TimeLine.from_frame(df, "begin", "finish")
+        assert timeline == self.expected
+        assert TimeLine.from_frame(timeline.to_frame()) == self.expected
+
+    def test_from_interval_index_and_to_interval_index(self):
+        index = self.expected.to_interval_index()
+        assert list(index.left) == [pd.Timestamp("2021-05-01 08:00"),
+                                    pd.Timestamp("2021-05-01 13:00")]
+        assert TimeLine.from_interval_index(index) == self.expected
+
+
+class TestConsumeMany:
+
+    def test_consume_many_example(self):
+        timeline = TimeLine([
+            ("01.03.2021 08:00", "01.03.2021 10:00"),
+            ("01.03.2021 12:00", "01.03.2021 15:00")])
+        timedeltas = [pd.Timedelta("30 minutes"), pd.Timedelta("2 hours"), pd.Timedelta(0)]
+        consumed = timeline.consume_many(timedeltas)
+        assert consumed == [
+            TimeLine([("01.03.2021 08:00", "01.03.2021 08:30")]),
+            TimeLine([("01.03.2021 08:30", "01.03.2021 10:00"),
+                      ("01.03.2021 12:00", "01.03.2021 12:30")]),
+            TimeLine()]
+        assert timeline == TimeLine([("01.03.2021 12:30", "01.03.2021 15:00")])
+
+    def test_raises_error_before_consuming_anything(self):
+        timeline = TimeLine([("01.03.2021 08:00", "01.03.2021 10:00")])
+        with pytest.raises(UnsuficientTimedeltaError):
+            timeline.consume_many([pd.Timedelta("1 hour"), pd.Timedelta("2 hours")])
+        assert timeline == TimeLine([("01.03.2021 08:00", "01.03.2021 10:00")])
+
+    @given(list_tuples=st.lists(cs.dtr_tp(), min_size=1, max_size=20), list_timedeltas=cs.list_timedeltas())
+    @settings(deadline=None)
+    def test_consume_many_equals_repeated_consume_property(self, list_tuples, list_timedeltas):
+        timeline = TimeLine([TimeRange(*tpl) for tpl in list_tuples])
+        if sum(list_timedeltas, pd.Timedelta(0)) > timeline.timedelta:
+            with pytest.raises(UnsuficientTimedeltaError):
+                timeline.consume_many(list_timedeltas)
+            return
+        consumed, remaining = timeline.consume_many(list_timedeltas, update=False)
+        expected_remaining = timeline.copy()
+        expected_consumed = [expected_remaining.consume(timedelta) for timedelta in list_timedeltas]
+        assert consumed == expected_consumed
+        assert remaining == expected_remaining
+
+
+class TestCapacityQueries:
+
+    timeline = TimeLine([
+        ("01.03.2021 08:00", "01.03.2021 10:00"),
+        ("01.03.2021 12:00", "01.03.2021 15:00")])
+
+    def test_position_of(self):
+        assert self.timeline.position_of(pd.Timestamp("2021-03-01 07:00")) == pd.Timedelta(0)
+        assert self.timeline.position_of(pd.Timestamp("2021-03-01 09:00")) == pd.Timedelta("1 hour")
+        assert self.timeline.position_of(pd.Timestamp("2021-03-01 11:00")) == pd.Timedelta("2 hours")
+        assert self.timeline.position_of(pd.Timestamp("2021-03-01 16:00")) == pd.Timedelta("5 hours")
+
+    def test_available_between(self):
+        available = self.timeline.available_between(
+            pd.Timestamp("2021-03-01 09:30"), pd.Timestamp("2021-03-01 13:00"))
+        assert available == pd.Timedelta("1 hour 30 minutes")
+
+    def test_finish_time(self):
+        finish = self.timeline.finish_time(pd.Timestamp("2021-03-01 09:00"), pd.Timedelta("2 hours"))
+        assert finish == pd.Timestamp("2021-03-01 13:00")
+        finish = self.timeline.finish_time(pd.Timestamp("2021-03-01 10:30"), pd.Timedelta(0))
+        assert finish == pd.Timestamp("2021-03-01 10:30")
+
+    def test_finish_time_raises_error_if_available_time_after_start_is_too_short(self):
+        with pytest.raises(UnsuficientTimedeltaError):
+            self.timeline.finish_time(pd.Timestamp("2021-03-01 13:00"), pd.Timedelta("3 hours"))
+
+    def test_prefix_sums_are_invalidated_by_consume(self):
+        timeline = self.timeline.copy()
+        assert timeline.timedelta == pd.Timedelta("5 hours")
+        timeline.consume(pd.Timedelta("1 hour"))
+        assert timeline.timedelta == pd.Timedelta("4 hours")
+        assert timeline.position_of(pd.Timestamp("2021-03-01 13:00")) == pd.Timedelta("2 hours")
+
+    @given(list_tuples=st.lists(cs.dtr_tp(), min_size=1, max_size=20), list_timedeltas=cs.list_timedeltas())
+    @settings(deadline=None)
+    def test_finish_time_equals_end_of_consumed_property(self, list_tuples, list_timedeltas):
+        timeline = TimeLine([TimeRange(*tpl) for tpl in list_tuples])
+        for timedelta in list_timedeltas:
+            if timedelta <= timeline.timedelta and timedelta > pd.Timedelta(0):
+                consumed, _ = timeline.consume(timedelta, update=False)
+                assert timeline.finish_time(timeline.start_time, timedelta) == consumed.end_time
+
+    def test_cumulative_at(self):
+        cumulative = self.timeline.cumulative_at(
+            [pd.Timestamp("2021-03-01 16:00"), pd.Timestamp("2021-03-01 07:00"),
+             pd.Timestamp("2021-03-01 13:00")])
+        assert cumulative.tolist() == [pd.Timedelta(hours=h).value for h in [5, 0, 3]]
+        with pytest.raises(ValueError):
+            self.timeline.cumulative_at([None])
+
+    def test_rolling_availability(self):
+        starts, available = self.timeline.rolling_availability(pd.Timedelta("2 hours"),
+                                                               pd.Timedelta("1 hour"))
+        assert list(starts) == list(pd.date_range("2021-03-01 08:00", "2021-03-01 13:00", freq="H"))
+        assert list(available) == [pd.Timedelta(hours=h) for h in [2, 1, 0, 1, 2, 2]]
+        with pytest.raises(ValueError):
+            self.timeline.rolling_availability(pd.Timedelta("2 hours"), pd.Timedelta(0))
+
+    @given(list_tuples=st.lists(cs.dtr_tp(), max_size=20),
+           window=st.sampled_from(["1 hour", "1 day", "7 days"]), step=st.sampled_from(["7 hours", "1 day"]))
+    @settings(deadline=None)
+    def test_rolling_availability_equals_split_property(self, list_tuples, window, step):
+        timeline = TimeLine(list_tuples)
+        starts, available = timeline.rolling_availability(pd.Timedelta(window), pd.Timedelta(step))
+        for start, timedelta in list(zip(starts, available))[::50]:
+            start = pd.Timestamp(start)
+            window_timeline = timeline.right_split(start).left_split(start + pd.Timedelta(window))
+            assert window_timeline.timedelta == timedelta
+
+
+class TestSlots:
+
+    def test_find_slot(self, timeline):
+        slot = timeline.find_slot(pd.Timedelta("3 hours"))
+        assert slot == TimeRange("01.03.2021 12:00", "01.03.2021 15:00")
+
+    def test_find_slot_after_release_time(self, timeline):
+        slot = timeline.find_slot(pd.Timedelta("1 hour"), pd.Timestamp("2021-03-01 08:30"))
+        assert slot == TimeRange("01.03.2021 08:30", "01.03.2021 09:30")
+        slot = timeline.find_slot(pd.Timedelta("2 hours"), pd.Timestamp("2021-03-01 14:30"))
+        assert slot is None
+
+    def test_reserve_slot_removes_slot(self, timeline):
+        slot = timeline.reserve_slot(pd.Timedelta("1 hour"), pd.Timestamp("2021-03-01 13:00"))
+        assert slot == TimeRange("01.03.2021 13:00", "01.03.2021 14:00")
+        slot = timeline.reserve_slot(pd.Timedelta("2 hours"))
+        assert slot == TimeRange("01.03.2021 08:00", "01.03.2021 10:00")
+        slot = timeline.reserve_slot(pd.Timedelta("2 hours"))
+        assert slot == TimeRange("01.03.2021 14:00", "01.03.2021 16:00")
+        assert timeline == TimeLine([
+            ("01.03.2021 12:00", "01.03.2021 13:00"),
+            ("01.03.2021 18:00", "01.03.2021 19:00")])
+
+    def test_reserve_slot_raises_error_if_no_timerange_is_long_enough(self, timeline):
+        with pytest.raises(UnsuficientTimedeltaError):
+            timeline.reserve_slot(pd.Timedelta("5 hours"))
+
+    @given(list_tuples=st.lists(st.one_of(cs.dtr_tp(), cs.dtr_grid_tp()), min_size=1, max_size=20),
+           list_timedeltas=cs.list_timedeltas(),
+           list_earliest=st.lists(st.one_of(st.none(), st.datetimes(
+               min_value=cs.VMIN_DATETIME, max_value=cs.VMAX_DATETIME).map(truncate)), min_size=10, max_size=10))
+    @settings(deadline=None)
+    def test_reserved_slots_equal_linear_scan_property(self, list_tuples, list_timedeltas, list_earliest):
+        timeline = TimeLine([TimeRange(*tpl) for tpl in list_tuples])
+        for timedelta, earliest in zip(list_timedeltas, list_earliest):
+            release = pd.Timestamp.min if earliest is None else pd.Timestamp(earliest)
+            expected = next((max(x.start_datetime, release) for x in timeline
+                             if x.end_datetime - max(x.start_datetime, release) >= timedelta), None)
+            if expected is None:
+                with pytest.raises(UnsuficientTimedeltaError):
+                    timeline.reserve_slot(timedelta, earliest)
+                continue
+            before = timeline.copy()
+            slot = timeline.reserve_slot(timedelta, earliest)
+            assert slot.start_datetime == expected
+            assert slot.timedelta == timedelta
+            assert timeline + TimeLine([slot]) == before
+
+    def test_reservations_update_the_slot_tree(self, timeline):
+        slot_tree = timeline._slot_tree
+        # split, shorten and remove timeranges
+        timeline.reserve_slot(pd.Timedelta("1 hour"), pd.Timestamp("2021-03-01 13:00"))
+        timeline.reserve_slot(pd.Timedelta("1 hour"))
+        timeline.reserve_slot(pd.Timedelta("1 hour"), pd.Timestamp("2021-03-01 18:00"))
+        assert timeline._slot_tree is slot_tree
+        assert timeline.find_slot(pd.Timedelta("2 hours")) == TimeRange("01.03.2021 14:00", "01.03.2021 16:00")
+        assert timeline.find_slot(pd.Timedelta("1 hour"), pd.Timestamp("2021-03-01 16:30")) is None
+
+
+class TestInsertRemove:
+
+    def test_insert_merges_neighbours(self, timeline):
+        timeline.insert(("01.03.2021 10:00", "01.03.2021 13:00"))
+        assert timeline == TimeLine([
+            ("01.03.2021 08:00", "01.03.2021 16:00"),
+            ("01.03.2021 18:00", "01.03.2021 19:00")])
+
+    def test_remove_cuts_neighbours(self, timeline):
+        timeline.remove(TimeRange("01.03.2021 09:00", "01.03.2021 18:30"))
+        assert timeline == TimeLine([
+            ("01.03.2021 08:00", "01.03.2021 09:00"),
+            ("01.03.2021 18:30", "01.03.2021 19:00")])
+
+    def test_remove_keeps_zero_length_timeranges_like_difference(self, timeline):
+        timeline += TimeLine([("01.03.2021 11:00", "01.03.2021 11:00"),
+                              ("01.03.2021 17:00", "01.03.2021 17:00")])
+        removed = TimeRange("01.03.2021 09:00", "01.03.2021 18:30")
+        expected = timeline.difference(TimeLine([removed]))
+        timeline.remove(removed)
+        assert timeline == expected
+        assert timeline.timeranges == [
+            TimeRange("01.03.2021 08:00", "01.03.2021 09:00"),
+            TimeRange("01.03.2021 11:00", "01.03.2021 11:00"),
+            TimeRange("01.03.2021 17:00", "01.03.2021 17:00"),
+            TimeRange("01.03.2021 18:30", "01.03.2021 19:00")]
+
+    @given(tuples=st.lists(st.one_of(cs.dtr_tp(), cs.dtr_grid_tp()), max_size=10), edits=st.lists(
+        st.tuples(st.booleans(), st.one_of(cs.dtr_tp(), cs.dtr_grid_tp())), max_size=10))
+    @settings(deadline=None)
+    def test_edits_equal_union_and_difference_property(self, tuples, edits):
+        timeline = TimeLine([TimeRange(*tpl) for tpl in tuples])
+        expected = timeline.copy()
+        for is_insert, tpl in edits:
+            if is_insert:
+                timeline.insert(TimeRange(*tpl))
+                expected = expected + TimeLine([TimeRange(*tpl)])
+            else:
+                timeline.remove(TimeRange(*tpl))
+                expected = expected.difference(TimeLine([TimeRange(*tpl)]))
+            assert timeline == expected
+
+
+class TestLookup:
+
+    timeline = TimeLine([("01.05.2021 08:00", "01.05.2021 10:00"),
+                         ("01.05.2021 11:00", "01.05.2021 12:00")])
+
+    def test_range_at(self):
+        assert self.timeline.range_at(pd.Timestamp("2021-05-01 11:30")) == TimeRange(
+            "01.05.2021 11:00", "01.05.2021 12:00")
+        assert self.timeline.range_at(pd.Timestamp("2021-05-01 10:00")) == TimeRange(
+            "01.05.2021 08:00", "01.05.2021 10:00")
+        assert self.timeline.range_at(pd.Timestamp("2021-05-01 10:30")) is None
+        assert self.timeline.range_at(pd.Timestamp("2021-05-01 07:00")) is None
+
+    def test_contains(self):
+        assert pd.Timestamp("2021-05-01 09:00") in self.timeline
+        assert pd.Timestamp("2021-05-01 10:30") not in self.timeline
+        assert TimeRange("01.05.2021 08:30", "01.05.2021 09:30") in self.timeline
+        assert TimeRange("01.05.2021 09:30", "01.05.2021 11:30") not in self.timeline
+
+    def test_left_and_right_split(self):
+        separator = pd.Timestamp("2021-05-01 09:00")
+        left, right = self.timeline.split(separator)
+        assert self.timeline.left_split(separator) == left
+        assert self.timeline.right_split(separator) == right
+
+
+class TestSplitAt:
+
+    timeline = TimeLine([("01.05.2021 08:00", "01.05.2021 10:00"),
+                         ("01.05.2021 11:00", "01.05.2021 12:00"),
+                         ("01.05.2021 13:00", "01.05.2021 14:00")])
+    separators = [pd.Timestamp("2021-05-01 09:00"), pd.Timestamp("2021-05-01 10:30"),
+                  pd.Timestamp("2021-05-01 13:30")]
+
+    def test_split_at(self):
+        assert self.timeline.split_at(self.separators) == [
+            TimeLine([("01.05.2021 08:00", "01.05.2021 09:00")]),
+            TimeLine([("01.05.2021 09:00", "01.05.2021 10:00")]),
+            TimeLine([("01.05.2021 11:00", "01.05.2021 12:00"),
+                      ("01.05.2021 13:00", "01.05.2021 13:30")]),
+            TimeLine([("01.05.2021 13:30", "01.05.2021 14:00")])]
+
+    def test_split_at_raises_error_if_separators_are_not_sorted(self):
+        with pytest.raises(ValueError):
+            self.timeline.split_at(self.separators[::-1])
+
+    def test_availability_per_bin(self):
+        bin_edges = [pd.Timestamp("2021-05-01 00:00")] + self.separators
+        availability = self.timeline.availability_per_bin(bin_edges)
+        assert list(availability) == [np.timedelta64(60, "m"), np.timedelta64(60, "m"),
+                                      np.timedelta64(90, "m")]
+
+    @given(tuples=st.lists(cs.dtr_tp(), max_size=10), separators=st.lists(cs.dtr_tp(), max_size=5))
+    @settings(deadline=None)
+    def test_split_at_equals_repeated_split_property(self, tuples, separators):
+        timeline = TimeLine([TimeRange(*tpl) for tpl in tuples])
+        separators = sorted(pd.Timestamp(start) for start, _ in separators)
+        pieces = timeline.split_at(separators)
+        remaining = timeline
+        for separator, piece in zip(separators, pieces):
+            left, remaining = remaining.split(separator)
+            assert piece == left
+        assert pieces[-1] == remaining
+        availability = timeline.availability_per_bin(separators)
+        assert list(availability) == [piece.timedelta for piece in pieces[1:-1]]
+
+
+class TestManyTimelines:
+
+    machine = TimeLine([("01.05.2021 08:00", "01.05.2021 12:00"),
+                        ("01.05.2021 13:00", "01.05.2021 17:00")])
+    operator = TimeLine([("01.05.2021 09:00", "01.05.2021 15:00")])
+    tooling = TimeLine([("01.05.2021 10:00", "01.05.2021 18:00")])
+
+    def test_intersect_all(self):
+        assert TimeLine.intersect_all([self.machine, self.operator, self.tooling]) == TimeLine([
+            ("01.05.2021 10:00", "01.05.2021 12:00"),
+            ("01.05.2021 13:00", "01.05.2021 15:00")])
+
+    def test_intersect_all_of_touching_timelines(self):
+        before = TimeLine([("01.05.2021 06:00", "01.05.2021 08:00")])
+        point = TimeLine([("01.05.2021 12:00", "01.05.2021 12:00")])
+        assert TimeLine.intersect_all([self.machine, before]) == TimeLine([
+            ("01.05.2021 08:00", "01.05.2021 08:00")])
+        assert TimeLine.intersect_all([self.machine, point]) == point
+        assert TimeLine.coverage([self.machine, before, point], min_count=2) == TimeLine([
+            ("01.05.2021 08:00", "01.05.2021 08:00"), ("01.05.2021 12:00", "01.05.2021 12:00")])
+
+    def test_union_all(self):
+        assert TimeLine.union_all([self.machine, self.operator, self.tooling]) == TimeLine([
+            ("01.05.2021 08:00", "01.05.2021 18:00")])
+        assert TimeLine.union_all([]) == TimeLine()
+
+    def test_coverage(self):
+        coverage = TimeLine.coverage([self.machine, self.operator, self.tooling], min_count=2)
+        assert coverage == TimeLine([("01.05.2021 09:00", "01.05.2021 17:00")])
+
+    def test_coverage_profile(self):
+        times, counts = TimeLine.coverage([self.machine, self.operator], profile=True)
+        assert list(times) == list(pd.to_datetime([
+            "2021-05-01 08:00", "2021-05-01 09:00", "2021-05-01 12:00",
+            "2021-05-01 13:00", "2021-05-01 15:00", "2021-05-01 17:00"]).values)
+        assert list(counts) == [1, 2, 1, 2, 1, 0]
+
+    @given(list_tuples=st.lists(st.lists(cs.dtr_tp(), max_size=5), min_size=1, max_size=4))
+    @settings(deadline=None)
+    def test_many_timelines_equal_pairwise_operations_property(self, list_tuples):
+        timelines = [TimeLine([TimeRange(*tpl) for tpl in tuples]) for tuples in list_tuples]
+        union, inter = timelines[0], timelines[0]
+        for timeline in timelines[1:]:
+            union, inter = union + timeline, inter.intersection(timeline)
+        assert TimeLine.union_all(timelines) == union
+        assert TimeLine.intersect_all(timelines) == inter
+        assert TimeLine.coverage(timelines) == TimeLine.coverage([union])
+
+
+class TestPersistence:
+
+    timeline = TimeLine([("01.05.2021 08:00", "01.05.2021 11:00"),
+                         ("01.05.2021 13:00", "01.05.2021 14:00"),
+                         ("02.05.2021 08:00", "02.05.2021 16:00")], ts_format="%d.%m.%Y %H:%M")
+
+    @pytest.mark.parametrize("mmap", [True, False])
+    def test_save_and_load(self, tmp_path, mmap):
+        path = tmp_path / "timeline.bin"
+        self.timeline.save(path)
+        loaded = TimeLine.load(path, mmap=mmap)
+        assert loaded == self.timeline
+        assert loaded.ts_format == self.timeline.ts_format
+        assert loaded._merged
+
+    def test_load_empty_timeline(self, tmp_path):
+        path = tmp_path / "timeline.bin"
+        TimeLine().save(path)
+        assert not TimeLine.load(path).is_valid
+
+    def test_operations_run_on_mapped_buffer(self, tmp_path):
+        path = tmp_path / "timeline.bin"
+        self.timeline.save(path)
+        loaded = TimeLine.load(path)
+        assert not loaded._starts.flags.writeable
+        left, right = loaded.split(pd.Timestamp("2021-05-01 12:00"))
+        assert np.shares_memory(left._starts, loaded._starts)
+        assert np.shares_memory(right._ends, loaded._ends)
+        assert loaded.intersection(self.timeline) == self.timeline
+        # consuming replaces the arrays and leaves the file untouched
+        loaded.consume(pd.Timedelta("1 hour"))
+        assert TimeLine.load(path) == self.timeline
+
+    def test_load_raises_error_on_other_files(self, tmp_path):
+        path = tmp_path / "timeline.bin"
+        path.write_bytes(b"\0" * 64)
+        with pytest.raises(ValueError):
+            TimeLine.load(path)
+
+    @given(list_tuples=st.lists(cs.dtr_tp(), max_size=20))
+    @settings(deadline=None, max_examples=30)
+    def test_save_and_load_property(self, tmp_path_factory, list_tuples):
+        path = tmp_path_factory.mktemp("persistence") / "timeline.bin"
+        timeline = TimeLine(list_tuples)
+        timeline.save(path)
+        assert TimeLine.load(path) == timeline
+
+
+class TestReservations:
+
+    def test_reserve_and_release(self, timeline):
+        expected = timeline.copy()
+        reservation = timeline.reserve(pd.Timedelta("3 hours"))
+        assert reservation == TimeRange("01.03.2021 12:00", "01.03.2021 15:00")
+        timeline.release(reservation)
+        assert timeline == expected
+
+    def test_release_raises_error_if_released_twice(self, timeline):
+        expected = timeline.copy()
+        reservation = timeline.reserve(pd.Timedelta("1 hour"))
+        timeline.release(reservation)
+        with pytest.raises(ValueError):
+            timeline.release(reservation)
+        assert timeline == expected
+
+    def test_concurrent_reservations_never_overlap(self):
+        timeline = TimeLine([("01.03.2021 00:00", "11.03.2021 00:00")])
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            reservations = list(executor.map(
+                lambda _: timeline.reserve(pd.Timedelta("1 hour")), range(200)))
+        merged = TimeLine(reservations)
+        assert merged.timedelta == pd.Timedelta("200 hours")
+        assert timeline.timedelta == pd.Timedelta("40 hours")
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(timeline.release, reservations))
+        assert timeline == TimeLine([("01.03.2021 00:00", "11.03.2021 00:00")])
+
+    def test_concurrent_modifications_never_overlap(self):
+        original = TimeLine([("01.03.2021 00:00", "11.03.2021 00:00")])
+        timeline = original.copy()
+        operations = [
+            lambda: [timeline.consume(pd.Timedelta("1 hour"))],
+            lambda: timeline.consume_many([pd.Timedelta("30 min")] * 2),
+            lambda: [TimeLine([timeline.reserve(pd.Timedelta("1 hour"))])],
+            lambda: [TimeLine([timeline.reserve_slot(pd.Timedelta("1 hour"))])],
+        ]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            taken = flatten(executor.map(lambda i: operations[i % 4](), range(200)))
+        assert sum((piece.timedelta for piece in taken), pd.Timedelta(0)) == pd.Timedelta("200 hours")
+        assert TimeLine.union_all(taken + [timeline]) == original
+        assert timeline.timedelta == pd.Timedelta("40 hours")
+
+    def test_concurrent_queries_see_no_stale_cache(self, monkeypatch):
+        monkeypatch.setattr(TimeLine, "validate_cache", True)
+        timeline = TimeLine([("01.03.2021 00:00", "11.03.2021 00:00")])
+
+        def reserve_and_release(i):
+            reservation = timeline.reserve(pd.Timedelta("1 hour"), earliest=pd.Timestamp("2021-03-01"))
+            timeline.find_slot(pd.Timedelta(hours=i % 5))
+            timeline.position_of(pd.Timestamp("2021-03-05"))
+            timeline.release(reservation)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(reserve_and_release, range(200)))
+        assert timeline == TimeLine([("01.03.2021 00:00", "11.03.2021 00:00")])
+
+    def test_split_during_reservations_sees_one_version(self):
+        starts = pd.date_range("2021-03-01 08:00", periods=5000, freq="D")
+        timeline = TimeLine.from_arrays(starts, starts + pd.Timedelta("8 hours"))
+        total, stop = timeline.timedelta, threading.Event()
+
+        def reserve_and_release():
+            for i in itertools.cycle(range(0, 5000, 7)):
+                if stop.is_set():
+                    return
+                timeline.release(timeline.reserve(pd.Timedelta("1 hour"), starts[i] + pd.Timedelta("2 hours")))
+        # switch threads often, so that reservations land between the reads of split
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        thread = threading.Thread(target=reserve_and_release)
+        thread.start()
+        try:
+            for _ in range(2000):
+                before, after = timeline.split(starts[2500])
+                for piece in (before, after):
+                    assert np.all(piece._starts <= piece._ends)
+                assert before.timedelta + after.timedelta in (total, total - pd.Timedelta("1 hour"))
+        finally:
+            stop.set()
+            thread.join()
+            sys.setswitchinterval(interval)
+
+    def test_pickle_timeline(self, timeline):
+        timeline.reserve(pd.Timedelta("1 hour"))
+        loaded = pickle.loads(pickle.dumps(timeline))
+        assert loaded == timeline
+        loaded.reserve(pd.Timedelta("1 hour"))
+
+
+class TestSnapshots:
+
+    def test_rollback_restores_consumed_timeline(self, timeline):
+        expected = timeline.copy()
+        snapshot = timeline.snapshot()
+        timeline.consume(pd.Timedelta("3 hours"))
+        timeline.reserve_slot(pd.Timedelta("1 hour"))
+        timeline.rollback(snapshot)
+        assert timeline == expected
+        assert timeline.reserve_slot(pd.Timedelta("3 hours")) == TimeRange(
+            "01.03.2021 12:00", "01.03.2021 15:00")
+
+    def test_snapshot_is_not_changed_by_slot_tree_updates(self, timeline):
+        timeline.find_slot(pd.Timedelta("1 hour"))
+        snapshot = timeline.snapshot()
+        timeline.reserve_slot(pd.Timedelta("1 hour"), pd.Timestamp("2021-03-01 13:00"))
+        timeline.rollback(snapshot)
+        assert timeline.find_slot(pd.Timedelta("4 hours")) == TimeRange(
+            "01.03.2021 12:00", "01.03.2021 16:00")
+
+    def test_branch_shares_arrays(self, timeline):
+        expected = timeline.copy()
+        timeline.position_of(pd.Timestamp("2021-03-01 13:00"))
+        branch = timeline.branch()
+        assert np.shares_memory(branch._starts, timeline._starts)
+        assert branch._prefix_sums is timeline._prefix_sums
+        branch.consume(pd.Timedelta("3 hours"))
+        assert timeline == expected
+        assert np.shares_memory(branch._ends, timeline._ends)
+
+    def test_arrays_are_read_only(self, timeline):
+        with pytest.raises(ValueError):
+            timeline._starts[0] = 0
+
+    @given(list_tuples=st.lists(cs.dtr_tp(), max_size=20), list_timedeltas=cs.list_timedeltas())
+    @settings(deadline=None)
+    def test_branches_are_independent_property(self, list_tuples, list_timedeltas):
+        timeline = TimeLine(list_tuples)
+        expected = timeline.copy()
+        snapshot = timeline.snapshot()
+        branch = timeline.branch()
+        for timedelta in list_timedeltas:
+            if timedelta > branch.timedelta:
+                break
+            branch.consume(timedelta)
+            timeline.consume(timedelta)
+        assert branch == timeline
+        timeline.rollback(snapshot)
+        assert timeline == expected
+
+
+class TestCachedAggregates:
+
+    def test_largest_gap(self, timeline):
+        assert timeline.largest_gap == pd.Timedelta("2 hours")
+        timeline.insert(("01.03.2021 16:00", "01.03.2021 17:00"))
+        assert timeline.largest_gap == pd.Timedelta("2 hours")
+        timeline.consume(pd.Timedelta("3 hours"))
+        assert timeline.largest_gap == pd.Timedelta("1 hour")
+        timeline.consume(pd.Timedelta("4 hours"))
+        assert timeline.largest_gap == pd.Timedelta(0)
+
+    def test_value_computed_from_replaced_arrays_is_not_cached(self, timeline):
+        def compute():
+            prefix_sums = timeline._compute_prefix_sums()
+            # another thread changes the timeline meanwhile
+            timeline.insert(("02.03.2021 08:00", "02.03.2021 10:00"))
+            return prefix_sums
+        timeline._cached("prefix_sums", compute)
+        assert "prefix_sums" not in timeline._cache
+        assert timeline.timedelta == pd.Timedelta("9 hours")
+
+    def test_validate_cache_detects_stale_values(self, monkeypatch, timeline):
+        monkeypatch.setattr(TimeLine, "validate_cache", True)
+        assert timeline.timedelta == pd.Timedelta("7 hours")
+        timeline._cache["prefix_sums"] = timeline._cache["prefix_sums"] + 1
+        with pytest.raises(AssertionError):
+            timeline.timedelta
+
+    @given(list_tuples=st.lists(cs.dtr_tp(), max_size=20), list_timedeltas=cs.list_timedeltas())
+    @settings(deadline=None)
+    def test_cache_is_never_stale_property(self, list_tuples, list_timedeltas):
+        TimeLine.validate_cache = True
+        try:
+            timeline = TimeLine(list_tuples)
+            for timedelta in list_timedeltas:
+                timeline.largest_gap, timeline.find_slot(timedelta)
+                if timedelta > timeline.timedelta:
+                    break
+                if timeline.find_slot(timedelta) is not None:
+                    timeline.release(timeline.reserve(timedelta))
+                timeline.consume(timedelta)
+                if timeline.is_valid:
+                    timeline.insert(TimeRange(timeline.end_time, timeline.end_time + timedelta))
+                timeline += timeline.branch()
+                timeline.timedelta, timeline.largest_gap, timeline.find_slot(timedelta)
+        finally:
+            TimeLine.validate_cache = False
+
+
+class TestMemoization:
+
+    shifts = TimeLine([("01.03.2021 06:00", "01.03.2021 14:00"),
+                       ("02.03.2021 06:00", "02.03.2021 14:00")])
+    maintenance = TimeLine([("01.03.2021 12:00", "01.03.2021 13:00")])
+
+    @pytest.fixture
+    def memo(self, monkeypatch):
+        memo = OperationCache(maxsize=2)
+        monkeypatch.setattr(TimeLine, "memo", memo)
+        return memo
+
+    def test_fingerprint(self):
+        assert self.shifts.fingerprint == self.shifts.copy().fingerprint
+        assert self.shifts.fingerprint != self.maintenance.fingerprint
+        assert TimeLine().fingerprint != self.maintenance.fingerprint
+        timeline = self.shifts.copy()
+        timeline.consume(pd.Timedelta("1 hour"))
+        assert timeline.fingerprint != self.shifts.fingerprint
+
+    def test_fingerprint_is_updated_by_edits(self):
+        timeline = self.shifts.copy()
+        timeline.fingerprint
+        reservation = timeline.reserve(pd.Timedelta("2 hours"), pd.Timestamp("2021-03-02 08:00"))
+        edits = [
+            lambda: timeline.insert(("03.03.2021 06:00", "03.03.2021 14:00")),
+            lambda: timeline.insert(("02.03.2021 14:00", "02.03.2021 15:00")),
+            lambda: timeline.remove(("01.03.2021 09:00", "01.03.2021 10:00")),
+            lambda: timeline.reserve(pd.Timedelta("1 hour"), pd.Timestamp("2021-03-03 06:00")),
+            lambda: timeline.reserve_slot(pd.Timedelta("3 hours")),
+            lambda: timeline.release(reservation),
+            lambda: timeline.consume(pd.Timedelta("4 hours")),
+            lambda: timeline.consume_many([pd.Timedelta("30 min")] * 3),
+            lambda: timeline.consume(timeline.timedelta),
+        ]
+        for edit in edits:
+            edit()
+            # updated from the removed and added timeranges, not recomputed
+            assert "fingerprint" in timeline._cache
+            assert timeline.fingerprint == TimeLine(timeline.timeranges).fingerprint
+        assert timeline.fingerprint == TimeLine().fingerprint
+
+    def test_memoized_inter_diff(self, memo):
+        expected = self.shifts.inter_diff(self.maintenance)
+        inter, diff = self.shifts.copy().inter_diff(self.maintenance.copy())
+        assert (inter, diff) == expected
+        assert memo.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 2}
+        # results of a hit are independent timelines
+        diff.consume(pd.Timedelta("1 hour"))
+        assert self.shifts.inter_diff(self.maintenance)[1] == expected[1]
+
+    def test_memoized_split_and_consume(self, memo):
+        separator = pd.Timestamp("2021-03-01 20:00")
+        assert self.shifts.split(separator) == self.shifts.split(separator)
+        consumed = self.shifts.consume(pd.Timedelta("9 hours"), update=False)
+        assert self.shifts.consume(pd.Timedelta("9 hours"), update=False) == consumed
+        assert (memo.hits, memo.misses) == (2, 2)
+
+    def test_least_recently_used_results_are_evicted(self, memo):
+        for hours in [1, 2, 3, 1]:
+            self.shifts.consume(pd.Timedelta(hours=hours), update=False)
+        assert memo.stats() == {"hits": 0, "misses": 4, "size": 2, "maxsize": 2}
+        memo.clear()
+        assert memo.stats() == {"hits": 0, "misses": 0, "size": 0, "maxsize": 2}
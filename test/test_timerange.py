@@ -7,6 +7,7 @@ Created on Sat Feb 27 14:40:39 2021
 
 """
 
+import pickle
 import pytest
 from src.timerange import TimeRange
 from .custom_strategies import CustomStrategies as cs
@@ -106,3 +107,27 @@ class TestSubtraction:
         # assert property
         union = TimeRange.merge([inter_dtr]+diff_dtrs)
         assert union == [src_dtr]
+
+
+class TestImmutability:
+
+    dtr = TimeRange("01.05.2021 08:00", "01.05.2021 19:00")
+
+    def test_timerange_is_immutable(self):
+        with pytest.raises(AttributeError):
+            self.dtr.format = '%d-%m-%Y %H:%M'
+
+    def test_copy_returns_same_object(self):
+        assert self.dtr.copy() is self.dtr
+
+    def test_timerange_is_hashable(self):
+        same_dtr = TimeRange("01-05-2021 08:00", "01-05-2021 19:00", '%d-%m-%Y %H:%M')
+        assert len({self.dtr, same_dtr}) == 1
+
+    def test_pickle_roundtrip(self):
+        assert pickle.loads(pickle.dumps(self.dtr)) == self.dtr
+
+    def test_format_is_used_for_rendering(self):
+        assert repr(self.dtr) == "01.05.2021 08:00 - 01.05.2021 19:00"
+        dtr = TimeRange("01-05-2021 08:00", "01-05-2021 19:00", '%d-%m-%Y %H:%M')
+        assert repr(dtr) == "01-05-2021 08:00 - 01-05-2021 19:00"